@@ -8,10 +8,9 @@ from flask_mail import Mail
 from flask_s3 import FlaskS3
 from flask_talisman import Talisman
 from flask_migrate import Migrate
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 
 from config import Config
+from app.cache import ArticleCache, UserCache
 
 # Instantiate app database engine
 db = SQLAlchemy()
@@ -27,12 +26,8 @@ mail = Mail()
 s3 = FlaskS3()
 talisman = Talisman()
 migrate = Migrate()
-
-# Initialise and configure APScheduler for image deletion
-# Persist scheduled jobs using database
-scheduled_delete = BackgroundScheduler(jobstores={
-    'default': SQLAlchemyJobStore(url=Config.SQLALCHEMY_DATABASE_URI)
-})
+article_cache = ArticleCache()
+user_cache = UserCache()
 
 
 def create_app(config_class=Config):
@@ -50,6 +45,8 @@ def create_app(config_class=Config):
     s3.init_app(app)
     talisman.init_app(app, content_security_policy=None)
     migrate.init_app(app, db)
+    article_cache.init_app(app)
+    user_cache.init_app(app)
     
     # Register blueprints
     from app.auth import bp as auth_bp
@@ -62,7 +59,9 @@ def create_app(config_class=Config):
     app.register_blueprint(main_bp)
 
     from app.publish import bp as publish_bp
+    from app.publish.storage import storage
     app.register_blueprint(publish_bp)
+    storage.init_app(app)
 
     # Email all errors to all admins while in production
     # https://blog.miguelgrinberg.com/post/the-flask-mega-tutorial-part-vii-error-handling 
@@ -83,10 +82,6 @@ def create_app(config_class=Config):
             mail_handler.setLevel(logging.ERROR)
             app.logger.addHandler(mail_handler)
 
-    # Start APScheduler for image deletion
-    if not scheduled_delete.running:
-        scheduled_delete.start()
-
     return app
 
 
@@ -3,7 +3,8 @@ from flask_login import current_user, login_user, logout_user
 from flask_mail import Message
 from werkzeug.urls import url_parse
 
-from app import db, mail
+from app import db, user_cache
+from app.outbox import queue_message
 from app.auth import bp
 from app.auth.forms import LoginForm, RegisterForm, RequestPasswordResetForm, PasswordResetForm
 from app.models import User
@@ -28,12 +29,9 @@ def register():
             email = form.email.data)
         user.set_password(form.password.data)
         
-        # Add user to database and commit
+        # Add and flush user to get user ID for token
         db.session.add(user)
-        db.session.commit()
-
-        # Log user in
-        login_user(user)
+        db.session.flush()
 
         # Send email confirmation with user token
         msg = Message(
@@ -43,7 +41,13 @@ def register():
             html = render_template('/email/email-request-to-confirm-email.html',
                 user=user,
                 token=user.send_token()))
-        mail.send(msg)
+        queue_message(msg)
+
+        # Record user and email
+        db.session.commit()
+
+        # Log user in
+        login_user(user)
 
         # Alert user 
         flash('You are successfully registered. Please confirm your email address.', 'success')
@@ -67,7 +71,8 @@ def resent_email_confirmation():
         html = render_template('/email/email-request-to-confirm-email.html',
             user=current_user,
             token=current_user.send_token()))
-    mail.send(msg)
+    queue_message(msg)
+    db.session.commit()
 
     # Alert user 
     flash('Confirmation email resent. Please check your spam folder.', 'success')
@@ -98,6 +103,7 @@ def confirm_email(token):
 
     # Record, alert, and redirect
     db.session.commit()
+    user_cache.invalidate(user.id)
     flash('You are fully registered. You may now make publication requests.', 'success')
     return redirect(url_for('main.index'))
     
@@ -185,7 +191,8 @@ def request_password_reset():
             html = render_template('/email/email-request-to-reset-password.html',
                 user=user,
                 token=user.send_token()))
-        mail.send(msg)
+        queue_message(msg)
+        db.session.commit()
         
         # Alert and redirect user
         flash('Check your email for instructions to reset your password.', 'info')
@@ -224,6 +231,7 @@ def reset_password(token):
         # Hash and record new password
         user.set_password(form.password.data)
         db.session.commit()
+        user_cache.invalidate(user.id)
 
         # Alert and return user
         flash('Your password has been successfully reset.', 'success')
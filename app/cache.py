@@ -0,0 +1,199 @@
+"""Cache the rendered pages of published articles, and logged in users
+
+Published articles are read far more often than they are changed, and only
+change through the publishing routes. Rendered pages are therefore stored
+against their publishing note and served without querying the article tree.
+
+Each entry is stamped with the publishing note's content version. Routes that
+change published content bump the version, so that stale entries held by
+other processes are never served, and remove the local entry directly.
+
+Backends are selected by ARTICLE_CACHE_TYPE:
+ - 'lru' stores pages in process memory, bounded by ARTICLE_CACHE_THRESHOLD.
+ - 'filesystem' stores pages in ARTICLE_CACHE_DIR, shared between processes.
+ - 'null' disables the cache.
+
+Logged in users are loaded upon every request. Optionally, their User and 
+Publisher rows are also held in process memory for USER_CACHE_TIMEOUT seconds. 
+Routes that change a user's role or credentials drop the entry held by the
+process that handled them only. Other processes hold their entry until it
+times out, so USER_CACHE_TIMEOUT is also the window in which a demoted
+publisher or reset password is still honoured elsewhere.
+"""
+
+import threading
+from collections import OrderedDict
+from time import time
+
+from cachelib import BaseCache, FileSystemCache, NullCache
+
+
+class LRUCache(BaseCache):
+    """An in-process cache that evicts the least recently used entry
+
+    Entries are held in insertion order and moved to the end upon each read, so
+    that the first entry is always the next to be evicted once the number of
+    entries exceeds the threshold.
+    """
+
+    def __init__(self, threshold=500, default_timeout=0):
+        super().__init__(default_timeout)
+        self._cache = OrderedDict()
+        self._threshold = threshold
+        self._lock = threading.Lock()
+
+    def _expires(self, timeout):
+        if timeout is None:
+            timeout = self.default_timeout
+        return time() + timeout if timeout > 0 else 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._cache[key]
+            except KeyError:
+                return None
+            if expires != 0 and expires <= time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._cache[key] = (self._expires(timeout), value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._threshold:
+                self._cache.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        with self._lock:
+            if key in self._cache:
+                return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._cache.pop(key, None) is not None
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+        return True
+
+
+class ArticleCache(object):
+    """A Flask extension to store rendered article pages
+
+    Methods
+    -------
+    get
+        Return the page cached for the publishing note's current version
+    set
+        Store the page rendered for the publishing note's current version
+    invalidate
+        Bump the publishing note's content version and drop its cached page
+    -------
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('ARTICLE_CACHE_TYPE', 'lru')
+        timeout = app.config.get('ARTICLE_CACHE_TIMEOUT', 0)
+        threshold = app.config.get('ARTICLE_CACHE_THRESHOLD', 500)
+
+        if cache_type == 'lru':
+            self.backend = LRUCache(
+                threshold=threshold,
+                default_timeout=timeout)
+        elif cache_type == 'filesystem':
+            self.backend = FileSystemCache(
+                app.config['ARTICLE_CACHE_DIR'],
+                threshold=threshold,
+                default_timeout=timeout)
+        elif cache_type == 'null':
+            self.backend = NullCache()
+        else:
+            raise ValueError(f'Unknown article cache type: {cache_type}')
+
+        app.extensions['article_cache'] = self
+
+    @staticmethod
+    def _key(publishing_note_id):
+        return f'article-page-{publishing_note_id}'
+
+    def get(self, publishing_note):
+        entry = self.backend.get(self._key(publishing_note.id))
+        if entry is None or entry['version'] != publishing_note.version:
+            return None
+        return entry['page']
+
+    def set(self, publishing_note, page):
+        self.backend.set(self._key(publishing_note.id), {
+            'version': publishing_note.version,
+            'page': page})
+
+    def invalidate(self, publishing_note):
+        publishing_note.version = (publishing_note.version or 0) + 1
+        self.backend.delete(self._key(publishing_note.id))
+
+    def clear(self):
+        self.backend.clear()
+
+
+class UserCache(object):
+    """A Flask extension to store the rows of logged in users in process memory
+
+    Disabled unless USER_CACHE_TIMEOUT is set. Entries are held per process, 
+    and invalidation only reaches the current process: other processes keep 
+    granting a removed publisher access, for example, for up to 
+    USER_CACHE_TIMEOUT seconds. Keep it short, or leave it disabled.
+
+    Methods
+    -------
+    get
+        Return the user's cached User and Publisher column values
+    set
+        Store the user's User and Publisher column values
+    invalidate
+        Drop the user's cached values
+    -------
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        timeout = app.config.get('USER_CACHE_TIMEOUT', 0)
+
+        if timeout > 0:
+            self.backend = LRUCache(
+                threshold=app.config.get('USER_CACHE_THRESHOLD', 1000),
+                default_timeout=timeout)
+        else:
+            self.backend = NullCache()
+
+        app.extensions['user_cache'] = self
+
+    @staticmethod
+    def _key(user_id):
+        return f'user-{user_id}'
+
+    def get(self, user_id):
+        return self.backend.get(self._key(user_id))
+
+    def set(self, user_id, values):
+        self.backend.set(self._key(user_id), values)
+
+    def invalidate(self, user_id):
+        self.backend.delete(self._key(user_id))
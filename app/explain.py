@@ -0,0 +1,70 @@
+"""Capture the query plans of the SQL statements executed by a route
+
+Indexes only help if the planner uses them. Requests are made through the test
+client while the statements they execute are recorded, then each statement is
+explained and its plan searched for sequential scans of large tables.
+
+Run against a copy of production data before deploying, as the planner
+sequentially scans small tables regardless of their indexes.
+"""
+
+from sqlalchemy import event
+
+
+class StatementRecorder:
+    """Record the statements of the given kinds executed on an engine while in context
+
+    Only SELECT statements are recorded by default, as only they are explained.
+    """
+
+    def __init__(self, engine, kinds=('SELECT',)):
+        self.engine = engine
+        self.kinds = tuple(kinds)
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(self.kinds) \
+                and not (executemany and 'SELECT' in self.kinds):
+            self.statements.append((statement, parameters))
+
+
+def explain(connection, statement, parameters):
+    """Return the plan of a recorded statement, without executing it"""
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+        return cursor.fetchone()[0][0]['Plan']
+    finally:
+        cursor.close()
+
+
+def find_seq_scans(plan):
+    """Return the names of relations sequentially scanned anywhere in a plan"""
+
+    relations = []
+    if plan['Node Type'] == 'Seq Scan':
+        relations.append(plan['Relation Name'])
+    for subplan in plan.get('Plans', []):
+        relations.extend(find_seq_scans(subplan))
+    return relations
+
+
+def table_sizes(connection):
+    """Return the planner's estimated row count of each table"""
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT relname, reltuples FROM pg_class
+            WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace""")
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
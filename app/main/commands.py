@@ -0,0 +1,121 @@
+import sys
+
+import click
+from flask import current_app, url_for
+
+from app import db
+from app.main import bp
+from app.explain import StatementRecorder, explain, find_seq_scans, table_sizes
+from app.outbox import run_worker
+from app.scheduler import run_scheduler
+from app.models import User, PublishingNote
+
+
+# Listing and dashboard routes to explain, taking no URL arguments
+ROUTES = [
+    'main.index',
+    'main.filter_articles',
+    'main.more_articles',
+    'publish.display_publishers',
+    'publish.display_writers',
+    'publish.display_requests',
+    'publish.display_admin_articles',
+    'publish.display_publisher_articles',
+    'publish.display_author_articles',
+]
+
+
+@bp.cli.command('explain-routes')
+@click.argument('urls', nargs=-1)
+@click.option('--user', 'email',
+    help='Email of the user to request routes as. Dashboards need a login.')
+@click.option('--min-rows', default=10000, show_default=True,
+    help='Estimated row count from which a sequentially scanned table fails the check.')
+@click.option('--verbose', is_flag=True,
+    help='Print every statement explained, not only those failing the check.')
+def explain_routes(urls, email, min_rows, verbose):
+    """Check route queries for sequential scans of large tables
+
+    Request the listing and dashboard routes, the newest live article, and any
+    further URLs given, and explain every SELECT statement each executes.
+    Exit with status 1 if any plan sequentially scans a table estimated to hold
+    at least --min-rows rows.
+    """
+
+    client = current_app.test_client()
+
+    # Log in as user
+    if email:
+        user = db.session.query(User).filter_by(email = email).one()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+
+    # Get URLs of routes
+    with current_app.test_request_context():
+        urls = [url_for(endpoint) for endpoint in ROUTES] + list(urls)
+        note = db.session.query(PublishingNote) \
+            .filter(PublishingNote.is_active == True) \
+            .order_by(PublishingNote.date_published.desc(),
+                      PublishingNote.id.desc()).first()
+        if note:
+            urls.append(url_for('publish.view_article', id=note.id, slug=note.slug))
+    db.session.remove()
+
+    connection = db.engine.raw_connection()
+    try:
+        sizes = table_sizes(connection)
+        failures = 0
+        for url in urls:
+
+            # Record statements executed by route
+            with StatementRecorder(db.engine) as recorder:
+                response = client.get(url)
+            click.echo(f'{url} [{response.status_code}] '
+                f'{len(recorder.statements)} statements')
+
+            # Explain statements and check for sequential scans of large tables
+            for statement, parameters in recorder.statements:
+                plan = explain(connection, statement, parameters)
+                scans = [table for table in find_seq_scans(plan)
+                    if sizes.get(table, 0) >= min_rows]
+                if scans:
+                    failures += 1
+                    click.echo(f'  Seq Scan on {", ".join(scans)}:')
+                if scans or verbose:
+                    click.echo('    ' + ' '.join(statement.split()))
+    finally:
+        connection.close()
+
+    click.echo(f'{failures} statements sequentially scan large tables.')
+    if failures:
+        sys.exit(1)
+
+
+@bp.cli.command('mail-worker')
+@click.option('--once', is_flag=True,
+    help='Deliver the messages due, then exit.')
+@click.option('--interval', type=float,
+    help='Seconds to wait between polls when idle. Defaults to MAIL_WORKER_INTERVAL.')
+def mail_worker(once, interval):
+    """Deliver outgoing mail from the outbox
+
+    Run as its own process (see Procfile), so that requests never wait on the 
+    mail server. Any number of workers may run at once.
+    """
+
+    changes = run_worker(interval=interval, once=once)
+    click.echo(f'{changes["sent"]} sent, {changes["retried"]} retried, {changes["dead"]} dead.')
+
+
+@bp.cli.command('scheduler')
+@click.option('--interval', type=float,
+    help='Seconds between attempts to lead. Defaults to SCHEDULER_ELECTION_INTERVAL.')
+def scheduler(interval):
+    """Run scheduled jobs, such as sweeping unused images
+
+    Run as its own process (see Procfile). Any number of schedulers may run at 
+    once, but only the one holding the scheduler's advisory lock runs jobs.
+    """
+
+    run_scheduler(interval=interval)
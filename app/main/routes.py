@@ -1,13 +1,43 @@
 # || Imports
 
-from flask import render_template, redirect, url_for, flash, current_app
+from flask import render_template, redirect, url_for, flash, current_app, request, abort
 from flask_mail import Message
-from sqlalchemy import func
 
-from app import db, mail
+from app import db
+from app.outbox import queue_message
 from app.main import bp
 from app.main.forms import ContactForm
-from app.models import Article, Category, Image, PublishingNote
+from app.main.utils import live_articles, paginate_articles, decode_cursor, article_card, \
+    parse_month, filter_by_facets, article_facets
+
+
+# || Helpers
+
+def get_cursor():
+    """Get the pagination cursor from the URL, aborting if malformed"""
+
+    cursor = request.args.get('after')
+    if cursor is None:
+        return None
+
+    cursor = decode_cursor(cursor)
+    if cursor is None:
+        abort(400)
+    return cursor
+
+
+def get_facets():
+    """Get the category and month filters from the URL, aborting if malformed"""
+
+    category = request.args.get('category') or None
+    date = request.args.get('date') or None
+
+    month = None
+    if date:
+        month = parse_month(date)
+        if month is None:
+            abort(400)
+    return category, month
 
 
 # || VIews
@@ -15,42 +45,76 @@ from app.models import Article, Category, Image, PublishingNote
 @bp.route('/')
 @bp.route('/index')
 def index():
-    """Display live, published articles"""
-
-    articles = db.session.query(Article, Image, PublishingNote) \
-        .outerjoin(Image, Image.id == Article.image_id) \
-        .outerjoin(PublishingNote, PublishingNote.published_article_id == Article.id) \
-        .filter(Article.status == 'pub_live') \
-        .filter(PublishingNote.is_active == True) \
-        .order_by(PublishingNote.date_published.desc()).all()
+    """Display the first page of live, published articles
+    
+    Further pages are fetched from /more-articles as the reader scrolls.
+    """
 
+    # Get page of articles following cursor
+    articles, next_cursor = paginate_articles(live_articles(), get_cursor())
         
     # Render index page
-    return render_template('index.html', articles=articles)
+    return render_template('index.html', 
+        articles=articles,
+        next_cursor=next_cursor)
 
 
 @bp.route('/filter-articles')
 def filter_articles():
-    """Display a list of live, published articles to be filtered"""
-
-    categories = db.session.query(Category).all()
+    """Display a list of live, published articles filtered by category and date
+    
+    Filter articles in the database, and count the articles available under 
+    each category and month to label the filter options.
+    """
 
-    dates = db.session.query(func.to_char(PublishingNote.date_published, "FMMonth YYYY")) \
-        .group_by(func.to_char(PublishingNote.date_published, "FMMonth YYYY")).all()
+    # Get filters
+    category, month = get_facets()
 
-    articles = db.session.query(Article, Image, PublishingNote) \
-        .outerjoin(Image, Image.id == Article.image_id) \
-        .outerjoin(PublishingNote, PublishingNote.published_article_id == Article.id) \
-        .filter(Article.status == 'pub_live') \
-        .filter(PublishingNote.is_active == True) \
-        .order_by(PublishingNote.date_published.desc()).all()
+    # Get page of filtered articles following cursor
+    articles, next_cursor = paginate_articles(
+        filter_by_facets(live_articles(), category, month), get_cursor())
 
+    # Get article counts for filter options
+    facets = article_facets(category, month)
 
     # Render articles filter page
     return render_template('articles.html', 
-        categories=categories,
-        dates=dates,
-        articles=articles)
+        facets=facets,
+        category=category,
+        date=request.args.get('date'),
+        articles=articles,
+        next_cursor=next_cursor)
+
+
+@bp.route('/more-articles')
+def more_articles():
+    """Return a page of live, published articles as JSON
+    
+    Called by the infinite scroll and filters on article listing pages. 
+    
+    Articles are filtered by the optional category and date URL parameters. 
+    Article counts for the filter options are returned with the first page 
+    only, as they do not change as the reader scrolls.
+    """
+
+    # Get filters and cursor
+    category, month = get_facets()
+    cursor = get_cursor()
+
+    # Get page of filtered articles following cursor
+    articles, next_cursor = paginate_articles(
+        filter_by_facets(live_articles(), category, month), cursor)
+
+    # Compose article cards and cursor to following page
+    page = {
+        'articles': [article_card(article) for article in articles],
+        'next_cursor': next_cursor}
+
+    # Add article counts for filter options
+    if cursor is None:
+        page['facets'] = article_facets(category, month)
+
+    return page
 
 
 @bp.route('/about')
@@ -94,7 +158,8 @@ def contact():
             recipients = [current_app.config['ADMIN'][0]],
             bcc = [current_app.config['ADMIN'][1]], # me
             body = f'{form.name.data} has sent the following message: \n\n { form.message.data}')
-        mail.send(msg)
+        queue_message(msg)
+        db.session.commit()
 
         # Report message sent
         flash('Message successfully sent. Please await a response.', 'success')
@@ -0,0 +1,143 @@
+import datetime
+
+from flask import current_app, url_for
+from sqlalchemy import tuple_, func
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.models import Article, Category, Image, PublishingNote, article_category
+
+
+def live_articles():
+    """Return a query of live, published articles ordered newest first
+
+    PublishingNote ID breaks ties between articles published on the same date,
+    giving a total order for keyset pagination.
+
+    Load the categories of every article in the page with a single additional
+    query, rather than lazily per article as the listing is rendered.
+    """
+    return db.session.query(Article, Image, PublishingNote) \
+        .options(selectinload(Article.categories)) \
+        .outerjoin(Image, Image.id == Article.image_id) \
+        .join(PublishingNote, PublishingNote.published_article_id == Article.id) \
+        .filter(Article.status == 'pub_live') \
+        .filter(PublishingNote.is_active == True) \
+        .order_by(PublishingNote.date_published.desc(),
+                  PublishingNote.id.desc())
+
+
+def parse_month(value):
+    """Parse a month label, such as 'January 2022', into its first date
+
+    Return None if the label is malformed.
+    """
+    try:
+        return datetime.datetime.strptime(value, '%B %Y').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_by_facets(query, category=None, month=None):
+    """Filter a query of live articles by category name and month published
+
+    Filter months by date range rather than by formatted date, so that the 
+    publication date index can be used.
+    """
+    if category:
+        query = query.filter(Article.categories.any(Category.name == category))
+    if month:
+        next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+        query = query \
+            .filter(PublishingNote.date_published >= month) \
+            .filter(PublishingNote.date_published < next_month)
+    return query
+
+
+def article_facets(category=None, month=None):
+    """Return the number of live articles in each category and month
+
+    Count each facet under the other facet's filter, so that each count is the
+    number of results a reader would get by changing that filter alone.
+    """
+    category_counts = db.session.query(Category.name, func.count(Article.id)) \
+        .join(article_category, article_category.c.category_id == Category.id) \
+        .join(Article, Article.id == article_category.c.article_id) \
+        .join(PublishingNote, PublishingNote.published_article_id == Article.id) \
+        .filter(Article.status == 'pub_live') \
+        .filter(PublishingNote.is_active == True)
+    category_counts = filter_by_facets(category_counts, month=month) \
+        .group_by(Category.name) \
+        .order_by(Category.name).all()
+
+    month_label = func.to_char(PublishingNote.date_published, 'FMMonth YYYY')
+    month_start = func.date_trunc('month', PublishingNote.date_published)
+    month_counts = db.session.query(month_label, func.count(Article.id)) \
+        .select_from(Article) \
+        .join(PublishingNote, PublishingNote.published_article_id == Article.id) \
+        .filter(Article.status == 'pub_live') \
+        .filter(PublishingNote.is_active == True)
+    month_counts = filter_by_facets(month_counts, category=category) \
+        .group_by(month_label, month_start) \
+        .order_by(month_start.desc()).all()
+
+    return {
+        'categories': [{'name': name, 'count': count} 
+            for name, count in category_counts],
+        'dates': [{'name': name, 'count': count} 
+            for name, count in month_counts]}
+
+
+def encode_cursor(publishing_note):
+    """Encode the position of a publishing note as a URL-safe cursor"""
+    return f'{publishing_note.date_published.isoformat()}_{publishing_note.id}'
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into its publication date and PublishingNote ID
+
+    Return None if the cursor is malformed.
+    """
+    try:
+        date_published, id = cursor.split('_')
+        return datetime.date.fromisoformat(date_published), int(id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def paginate_articles(query, cursor=None, per_page=None):
+    """Return a page of articles following the cursor, and the next cursor
+
+    Seek past the cursor's position rather than offsetting, so that the cost of
+    each page is independent of its depth in the archive. Fetch one extra row
+    to determine whether a further page exists.
+    """
+    if per_page is None:
+        per_page = current_app.config['ARTICLES_PER_PAGE']
+
+    if cursor:
+        query = query.filter(
+            tuple_(PublishingNote.date_published, PublishingNote.id) < cursor)
+
+    articles = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(articles) > per_page:
+        articles = articles[:per_page]
+        next_cursor = encode_cursor(articles[-1]['PublishingNote'])
+
+    return articles, next_cursor
+
+
+def article_card(article):
+    """Serialise an article row to the data displayed on its listing card"""
+    return {
+        'url': url_for('publish.view_article',
+            id=article['PublishingNote'].id,
+            slug=article['PublishingNote'].slug),
+        'title': article['Article'].title,
+        'description': article['Article'].description,
+        'image_src': article['Image'].src if article['Image'] else None,
+        'image_alt': article['Image'].alt if article['Image'] else None,
+        'categories': [category.name for category in article['Article'].categories],
+        'date_published': article['PublishingNote'].date_published.strftime('%B %Y')}
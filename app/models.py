@@ -4,23 +4,66 @@
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from slugify import slugify
 from time import time
 import jwt
 
-from app import db, login
+from app import db, login, user_cache
 
 
-# Reload user object from session
+# Reload user object from session, with their publisher in the same query
 @login.user_loader
 def load_user(id):
-    return User.query.get(int(id))    # Flask-Login requires int, not string
+    id = int(id)    # Flask-Login requires int, not string
+
+    # Restore user from cache, if enabled
+    cached = user_cache.get(id)
+    if cached is not None:
+        user = restore_row(User, cached['user'])
+        publisher = restore_row(Publisher, cached['publisher']) if cached['publisher'] else None
+        set_committed_value(user, 'is_publisher', publisher)
+        return user
+
+    # Get user and publisher
+    user = db.session.query(User) \
+        .options(joinedload(User.is_publisher)) \
+        .filter(User.id == id).one_or_none()
+
+    if user is not None:
+        user_cache.set(id, {
+            'user': row_values(user),
+            'publisher': row_values(user.is_publisher) if user.is_publisher else None})
+    return user
+
+
+def row_values(obj):
+    """Return the column values of a model object, keyed by attribute"""
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+def restore_row(model, values):
+    """Return a model object, as if loaded by the session, from its cached values
+
+    Return the object already in the session, if any, rather than overwrite it.
+    """
+    existing = db.session.identity_map.get(
+        inspect(model).identity_key_from_primary_key([values['id']]))
+    if existing is not None:
+        return existing
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    db.session.add(obj)
+    return obj
 
 
 # Declare association tables first
 article_category = db.Table('article_category',
-    db.Column('article_id', db.ForeignKey('article.id')),
-    db.Column('category_id', db.ForeignKey('category.id')))
+    db.Column('article_id', db.ForeignKey('article.id'), index=True),
+    db.Column('category_id', db.ForeignKey('category.id'), index=True))
 
 
 class User(UserMixin, db.Model):
@@ -50,7 +93,7 @@ class User(UserMixin, db.Model):
     email_confirmed = db.Column(db.Boolean, default=False)
     password_hash = db.Column(db.String, unique=True)
     published_by = db.Column(db.ForeignKey('publisher.id',
-        use_alter=True)) # Resolve dependency cycle to allow DROP emission
+        use_alter=True), index=True) # Resolve dependency cycle to allow DROP emission
     # Relationships
     is_publisher = db.relationship('Publisher',
         backref='user',
@@ -95,10 +138,14 @@ class Publisher(db.Model):
     Selected at admin discretion, publishers help quality control content. 
     They also help create communities by publishing language- or category-
     specific content.   
+
+    Publishers receive publication requests 'immediate'ly, or in 'hourly' or
+    'daily' digests (see app/publish/digests.py).
     """
     # Attributes
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.ForeignKey('user.id'))
+    user_id = db.Column(db.ForeignKey('user.id'), index=True)
+    request_digest = db.Column(db.String, default='immediate', server_default='immediate', nullable=False)
     # Relationships
     writers = db.relationship('User',
         backref='publisher',
@@ -111,7 +158,8 @@ class Publisher(db.Model):
 class Image(db.Model):
     """An object to store an image's source and description
     
-    Images can be attached to articles and paragraphs.
+    Images can be attached to articles and paragraphs. Images that remain 
+    unused for UNUSED_IMAGE_MAX_AGE hours after upload are deleted.
     """
     # Attributes
     id = db.Column(db.Integer, primary_key=True)
@@ -119,6 +167,11 @@ class Image(db.Model):
     src = db.Column(db.String)
     cite = db.Column(db.String)
     used = db.Column(db.Boolean, default=False, nullable=False)
+    date_uploaded = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    # Index unused images in upload order, for deletion
+    __table_args__ = (
+        db.Index('ix_image_unused', date_uploaded,
+            postgresql_where=(used == False)),)
     # Relationships
     article = db.relationship('Article', 
         backref='image')
@@ -126,6 +179,22 @@ class Image(db.Model):
         backref='image')
 
 
+class StorageDeletion(db.Model):
+    """An object to record a stored image awaiting deletion
+
+    Deletions are recorded in the same transaction as the deletion of their 
+    Image objects, then removed once the image is deleted from storage. 
+    Deletions that fail remain recorded, with their number of attempts and 
+    last error, to be retried until STORAGE_DELETE_MAX_ATTEMPTS.
+    """
+    # Attributes
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String, nullable=False)
+    attempts = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    last_error = db.Column(db.String)
+    date_queued = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+
 class Article(db.Model):
     """An object to store the content of an article
 
@@ -134,15 +203,21 @@ class Article(db.Model):
 
     Deleting an Article model object cascade deletes the related model objects
     for Source, Paragraph, and Summary but not Category. 
+
+    The revision is incremented upon each save, so that a save based on an 
+    outdated revision can be detected and refused. The ORM increments it upon
+    every update, and only updates rows whose revision is unchanged since load.
     """
     # Attributes
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String)
     description = db.Column(db.String)
     image_id = db.Column(db.ForeignKey('image.id'))
-    status = db.Column(db.String)
+    status = db.Column(db.String, index=True)
     author_id = db.Column(db.ForeignKey('user.id'))
     publisher_id = db.Column(db.ForeignKey('publisher.id'))
+    revision = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    request_notified = db.Column(db.Boolean, default=False, server_default='false', nullable=False)
     # Relationships
     source = db.relationship('Source', 
         backref='summary', 
@@ -165,6 +240,12 @@ class Article(db.Model):
         backref='published_article',
         uselist=False,
         foreign_keys='PublishingNote.published_article_id')
+    # Indexes for author and publisher dashboards, filtered by status
+    __table_args__ = (
+        db.Index('ix_article_author_id_status', 'author_id', 'status'),
+        db.Index('ix_article_publisher_id_status', 'publisher_id', 'status'),)
+    # Version rows for optimistic concurrency
+    __mapper_args__ = {'version_id_col': revision}
 
 
 class Source(db.Model):
@@ -182,7 +263,7 @@ class Category(db.Model):
     """An object to store a label for an article's genre"""
     # Attributes
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, index=True, unique=True)
     # Relationships
     articles = db.relationship('Article', 
         secondary=article_category,
@@ -233,6 +314,8 @@ class PublishingNote(db.Model):
      - track the draft and published versions of published articles 
      - store the urls of the published versions of published articles
      - toggle the article on- and offline
+     - version the published content in order to invalidate cached pages
+     - store a snapshot of the published article's content for display
 
     The publishing note serves as a form of version control, pointing to the 
     draft and most recently published versions of an article. 
@@ -249,14 +332,56 @@ class PublishingNote(db.Model):
     """
     # Attributes
     id = db.Column(db.Integer, primary_key=True)
-    draft_article_id = db.Column(db.ForeignKey('article.id'))
-    published_article_id = db.Column(db.ForeignKey('article.id'))
+    draft_article_id = db.Column(db.ForeignKey('article.id'), index=True)
+    published_article_id = db.Column(db.ForeignKey('article.id'), index=True)
     slug = db.Column(db.String)
     date_published = db.Column(db.Date)
     date_updated = db.Column(db.Date)
     is_active = db.Column(db.Boolean)
+    version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    snapshot = db.deferred(db.Column(JSONB))    # Load only upon access
+    # Index live articles in listing order
+    __table_args__ = (
+        db.Index('ix_publishing_note_live', 
+            date_published.desc(), id.desc(),
+            postgresql_where=(is_active == True)),)
 
     def to_slug(self, value):
         self.slug = slugify(value)
 
 
+class OutboxMessage(db.Model):
+    """An object to store an email awaiting delivery
+
+    Messages are written in the same transaction as the change they report, 
+    and delivered by the mail worker (see app/outbox.py). Messages that fail 
+    are retried with exponential backoff, then marked 'dead' once they reach 
+    MAIL_MAX_ATTEMPTS. Messages being sent are marked 'sending', leased to a
+    worker until locked_until.
+    """
+    # Attributes
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String)
+    sender = db.Column(JSONB)
+    recipients = db.Column(JSONB, nullable=False)
+    cc = db.Column(JSONB)
+    bcc = db.Column(JSONB)
+    reply_to = db.Column(JSONB)
+    body = db.Column(db.Text)
+    html = db.Column(db.Text)
+    status = db.Column(db.String, default='pending', server_default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    last_error = db.Column(db.String)
+    date_created = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    next_attempt = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    date_sent = db.Column(db.DateTime)
+    locked_until = db.Column(db.DateTime)
+    # Index messages awaiting delivery in delivery order, leases to reclaim, and
+    # sent messages to purge
+    __table_args__ = (
+        db.Index('ix_outbox_message_pending', next_attempt,
+            postgresql_where=(status == 'pending')),
+        db.Index('ix_outbox_message_sending', locked_until,
+            postgresql_where=(status == 'sending')),
+        db.Index('ix_outbox_message_sent', date_sent,
+            postgresql_where=(status == 'sent')),)
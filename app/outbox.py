@@ -0,0 +1,231 @@
+"""Deliver outgoing mail from a persistent outbox
+
+Sending mail inside a request ties the request to the mail server: a slow or
+unreachable server stalls the worker, and a failed send can leave a change
+committed without its email. Instead, requests write each message to the
+outbox in the same transaction as the change it reports, and return at once.
+
+The mail worker, run by `flask main mail-worker`, delivers messages that are
+due in batches of MAIL_BATCH_SIZE over a single SMTP connection. Messages
+that fail are retried after MAIL_RETRY_DELAY seconds, doubling upon each
+attempt, until they reach MAIL_MAX_ATTEMPTS and are marked 'dead' for admin
+to inspect.
+
+Each batch is leased to its worker for MAIL_LEASE seconds and committed
+before sending, so that no transaction or lock is held while the mail server
+responds. Should a worker stop while sending, its batch is claimed again once 
+the lease expires, and may be delivered twice. Sent messages are purged after
+MAIL_RETENTION_DAYS by the scheduler process.
+
+While testing, Flask-Mail suppresses delivery and records messages instead.
+In development, any local SMTP server can stand in for the mail server, eg.
+`python -m aiosmtpd -n -l localhost:1025` with MAIL_SERVER=localhost and
+MAIL_PORT=1025.
+"""
+
+import datetime
+import time
+from collections import Counter
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import update, delete, or_, and_
+
+from app import db, mail
+from app.models import OutboxMessage
+
+
+def queue_message(msg):
+    """Add a Flask-Mail message to the outbox in the current transaction
+
+    The message is delivered by the mail worker once the transaction commits.
+    """
+
+    message = OutboxMessage(
+        subject = msg.subject,
+        sender = msg.sender,
+        recipients = list(msg.recipients),
+        cc = list(msg.cc or []),
+        bcc = list(msg.bcc or []),
+        reply_to = msg.reply_to,
+        body = msg.body,
+        html = msg.html)
+    db.session.add(message)
+    return message
+
+
+def to_message(message):
+    """Return the Flask-Mail message stored in the outbox"""
+
+    return Message(
+        subject = message.subject,
+        sender = message.sender,
+        recipients = message.recipients,
+        cc = message.cc,
+        bcc = message.bcc,
+        reply_to = message.reply_to,
+        body = message.body,
+        html = message.html)
+
+
+def retry_delay(attempts):
+    """Return the delay before the next attempt, doubling upon each attempt"""
+    return datetime.timedelta(
+        seconds=current_app.config['MAIL_RETRY_DELAY'] * 2 ** (attempts - 1))
+
+
+def claim_outbox(batch_size):
+    """Lease a batch of messages that are due to this worker, and commit
+
+    Lock the batch with SKIP LOCKED, so that concurrent workers claim 
+    different messages, then mark it 'sending' until MAIL_LEASE seconds from
+    now. Messages whose lease has expired, as their worker stopped while
+    sending, are claimed again. Return the IDs, attempts, and Flask-Mail
+    messages claimed.
+    """
+
+    now = db.func.now()
+
+    # Get messages due
+    messages = db.session.query(OutboxMessage) \
+        .filter(or_(
+            and_(OutboxMessage.status == 'pending', OutboxMessage.next_attempt <= now),
+            and_(OutboxMessage.status == 'sending', OutboxMessage.locked_until <= now))) \
+        .order_by(OutboxMessage.next_attempt, OutboxMessage.id) \
+        .limit(batch_size) \
+        .with_for_update(skip_locked=True).all()
+    claimed = [(message.id, message.attempts, to_message(message)) for message in messages]
+
+    # Lease messages
+    if claimed:
+        db.session.execute(update(OutboxMessage)
+            .where(OutboxMessage.id.in_([id for id, _, _ in claimed]))
+            .values(
+                status = 'sending',
+                locked_until = now + datetime.timedelta(seconds=current_app.config['MAIL_LEASE']))
+            .execution_options(synchronize_session=False))
+    db.session.commit()
+    return claimed
+
+
+def send_outbox(batch_size=None):
+    """Deliver a batch of messages that are due, and record the outcome
+
+    Claim the batch in one short transaction, send it outside any transaction
+    over one SMTP connection, then record the outcome in another, so that a 
+    slow mail server never holds locks. Return a count of the messages sent,
+    retried, and dead.
+    """
+
+    batch_size = batch_size or current_app.config['MAIL_BATCH_SIZE']
+    max_attempts = current_app.config['MAIL_MAX_ATTEMPTS']
+    changes = Counter()
+
+    # Claim messages due
+    claimed = claim_outbox(batch_size)
+    if not claimed:
+        return changes
+
+    # Send messages over a single connection
+    sent = []
+    failed = {}
+    try:
+        with mail.connect() as connection:
+            for id, attempts, msg in claimed:
+                try:
+                    connection.send(msg)
+                    sent.append(id)
+                except Exception as error:
+                    failed[id] = (attempts, str(error))
+    except Exception as error:
+        current_app.logger.exception('Mail server unavailable')
+        failed.update({id: (attempts, str(error)) for id, attempts, msg in claimed
+            if id not in sent and id not in failed})
+
+    # Record sent messages
+    leased = OutboxMessage.status == 'sending'
+    if sent:
+        db.session.execute(update(OutboxMessage)
+            .where(OutboxMessage.id.in_(sent), leased)
+            .values(status = 'sent', date_sent = db.func.now(), locked_until = None)
+            .execution_options(synchronize_session=False))
+        changes['sent'] += len(sent)
+
+    # Schedule failed messages for retry, or mark them dead
+    for id, (attempts, error) in failed.items():
+        attempts += 1
+        values = {'attempts': attempts, 'last_error': error, 'locked_until': None}
+        if attempts >= max_attempts:
+            values['status'] = 'dead'
+            changes['dead'] += 1
+            current_app.logger.error('Message %d dead after %d attempts: %s',
+                id, attempts, error)
+        else:
+            values['status'] = 'pending'
+            values['next_attempt'] = db.func.now() + retry_delay(attempts)
+            changes['retried'] += 1
+        db.session.execute(update(OutboxMessage)
+            .where(OutboxMessage.id == id, leased)
+            .values(**values)
+            .execution_options(synchronize_session=False))
+
+    db.session.commit()
+    return changes
+
+
+def purge_outbox(retention_days=None, batch_size=1000):
+    """Delete messages sent more than MAIL_RETENTION_DAYS ago, a batch at a time
+
+    Dead messages are kept for admin to inspect. Return the number deleted.
+    """
+
+    retention_days = retention_days or current_app.config['MAIL_RETENTION_DAYS']
+    sent_before = db.func.now() - datetime.timedelta(days=retention_days)
+    deleted = 0
+
+    while True:
+        batch = db.session.query(OutboxMessage.id) \
+            .filter(OutboxMessage.status == 'sent', OutboxMessage.date_sent < sent_before) \
+            .limit(batch_size) \
+            .with_for_update(skip_locked=True) \
+            .scalar_subquery()
+        count = db.session.execute(delete(OutboxMessage)
+            .where(OutboxMessage.id.in_(batch))
+            .execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def run_outbox_purge():
+    """Purge sent messages, as scheduled by the scheduler process"""
+
+    # Import app in order to access app context outside view function
+    from easy_read import app
+
+    with app.app_context():
+        deleted = purge_outbox()
+        app.logger.info('Outbox: %d sent messages purged', deleted)
+
+
+def run_worker(interval=None, once=False):
+    """Deliver messages until stopped, polling for new messages when idle
+
+    Deliver batches back to back while messages are due, then wait
+    MAIL_WORKER_INTERVAL seconds before polling again. If once is set, return
+    a count of the messages delivered once none are due.
+    """
+
+    interval = interval or current_app.config['MAIL_WORKER_INTERVAL']
+    total = Counter()
+    while True:
+        changes = send_outbox()
+        total.update(changes)
+        if changes:
+            current_app.logger.info('Outbox: %d sent, %d retried, %d dead',
+                changes['sent'], changes['retried'], changes['dead'])
+        elif once:
+            return total
+        else:
+            time.sleep(interval)
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 bp = Blueprint('publish', __name__)
 
-from app.publish import routes
+from app.publish import routes, commands
@@ -0,0 +1,71 @@
+import click
+from flask import current_app
+
+from app import db
+from app.publish import bp
+from app.publish.loader import snapshot_article
+from app.publish.utils import delete_stored_images, sweep_unused_images
+from app.models import PublishingNote
+
+
+@bp.cli.command('backfill-snapshots')
+@click.option('--all', 'refresh_all', is_flag=True,
+    help='Refresh existing snapshots as well as missing ones.')
+@click.option('--batch-size', default=100, show_default=True,
+    help='Number of snapshots to store per commit.')
+def backfill_snapshots(refresh_all, batch_size):
+    """Store snapshots of published articles for public view
+
+    Snapshots are stored upon publication. Run this command once after 
+    migration to snapshot articles published beforehand, or with --all to 
+    rebuild every snapshot.
+    """
+
+    # Get publishing notes to snapshot
+    query = db.session.query(PublishingNote.id) \
+        .filter(PublishingNote.published_article_id.isnot(None))
+    if not refresh_all:
+        query = query.filter(PublishingNote.snapshot.is_(None))
+    note_ids = [note_id for note_id, in query.order_by(PublishingNote.id)]
+
+    # Snapshot and commit in batches
+    for start in range(0, len(note_ids), batch_size):
+        notes = db.session.query(PublishingNote) \
+            .filter(PublishingNote.id.in_(note_ids[start:start + batch_size])).all()
+        for note in notes:
+            snapshot_article(note)
+        db.session.commit()
+
+    click.echo(f'{len(note_ids)} snapshots stored.')
+
+
+@bp.cli.command('retry-storage-deletions')
+def retry_storage_deletions():
+    """Retry deleting images from storage whose deletion has failed
+
+    Images are deleted from storage in the background once their article is
+    deleted. Deletions that fail are recorded, and retried by this command.
+    """
+
+    changes = delete_stored_images(current_app._get_current_object())
+    click.echo(f'{changes["deleted"]} images deleted, {changes["failed"]} failed, '
+        f'{changes["dead"]} given up.')
+
+
+@bp.cli.command('sweep-unused-images')
+@click.option('--max-age', type=int, 
+    help='Hours after upload to keep unused images. Defaults to UNUSED_IMAGE_MAX_AGE.')
+@click.option('--batch-size', type=int,
+    help='Number of images to delete per commit. Defaults to UNUSED_IMAGE_BATCH_SIZE.')
+def sweep_unused_images_command(max_age, batch_size):
+    """Delete images left unused in an article since upload
+
+    Sweeps run every UNUSED_IMAGE_SWEEP_INTERVAL minutes in the scheduler. 
+    Run this command to sweep immediately.
+    """
+
+    changes = sweep_unused_images(
+        current_app.config['UNUSED_IMAGE_MAX_AGE'] if max_age is None else max_age,
+        batch_size or current_app.config['UNUSED_IMAGE_BATCH_SIZE'])
+    click.echo(f'{changes["images"]} unused images deleted. '
+        f'{changes["deleted"]} stored images deleted, {changes["failed"]} failed.')
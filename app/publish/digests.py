@@ -0,0 +1,135 @@
+"""Email publication requests to publishers, immediately or in digests
+
+Each request is emailed to the article's assigned publisher. If none exists,
+it is emailed to the author's associated publisher. If still none exists, it
+is emailed to admin.
+
+Publishers choose how often they receive requests:
+ - 'immediate' emails each request as it is made.
+ - 'hourly' and 'daily' email a single digest of the requests made since the
+   last, so that mail to busy publishers stays bounded however many requests
+   their writers make.
+Admin receives requests as ADMIN_REQUEST_DIGEST chooses.
+
+Requests are marked as notified once emailed. Digests are built by one query
+over the requests not yet notified, which resolves each request's recipient
+and frequency, and are queued to the outbox (see app/outbox.py).
+
+Requests are matched to the recipient's current frequency, so requests still
+waiting for a digest are emailed at once when a publisher switches to 
+'immediate'.
+"""
+
+from flask import current_app, render_template
+from flask_mail import Message
+from sqlalchemy import update, case, literal
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.outbox import queue_message
+from app.models import Article, User, Publisher
+
+
+DIGEST_FREQUENCIES = ('immediate', 'hourly', 'daily')
+
+
+def requests_by_recipient(frequency, article_ids=None, recipient_email=None):
+    """Return the requests not yet notified, due at the frequency, by recipient
+
+    Return a dictionary of each recipient's email to a list of their requests,
+    each a tuple of the article and its author. Optionally, only return the
+    requests for the articles or the recipient given.
+    """
+
+    admin = current_app.config['ADMIN']
+    ArticlePublisher = aliased(Publisher)
+    ArticlePublisherUser = aliased(User)
+    Author = aliased(User)
+    AuthorPublisher = aliased(Publisher)
+    AuthorPublisherUser = aliased(User)
+
+    # Resolve each request's recipient and their frequency
+    recipient = case(
+        (ArticlePublisher.id != None, ArticlePublisherUser.email),
+        (AuthorPublisher.id != None, AuthorPublisherUser.email),
+        else_ = literal(admin[1]))
+    digest = case(
+        (ArticlePublisher.id != None, ArticlePublisher.request_digest),
+        (AuthorPublisher.id != None, AuthorPublisher.request_digest),
+        else_ = literal(current_app.config['ADMIN_REQUEST_DIGEST']))
+
+    # Get requests
+    query = db.session.query(Article, Author, recipient) \
+        .join(Author, Author.id == Article.author_id) \
+        .outerjoin(ArticlePublisher, ArticlePublisher.id == Article.publisher_id) \
+        .outerjoin(ArticlePublisherUser, ArticlePublisherUser.id == ArticlePublisher.user_id) \
+        .outerjoin(AuthorPublisher, AuthorPublisher.id == Author.published_by) \
+        .outerjoin(AuthorPublisherUser, AuthorPublisherUser.id == AuthorPublisher.user_id) \
+        .filter(Article.status.in_(('requested', 'pub_requested'))) \
+        .filter(Article.request_notified == False) \
+        .filter(digest == frequency) \
+        .order_by(recipient, Article.id)
+    if article_ids is not None:
+        query = query.filter(Article.id.in_(article_ids))
+    if recipient_email is not None:
+        query = query.filter(recipient == recipient_email)
+
+    requests = {}
+    for article, author, email in query:
+        requests.setdefault(email, []).append((article, author))
+    return requests
+
+
+def notify_requests(frequency, article_ids=None, recipient_email=None):
+    """Queue an email to each recipient of the requests due at the frequency
+
+    Email single immediate requests as before, replying to the author. Email
+    digests of several requests from admin. BCC admin to keep a record of
+    communication. Mark the requests notified in the current transaction,
+    which the caller commits. Return the number of emails queued.
+    """
+
+    admin = current_app.config['ADMIN']
+    requests = requests_by_recipient(frequency, article_ids, recipient_email)
+
+    # Render and queue emails
+    for recipient, recipient_requests in requests.items():
+        if frequency == 'immediate' and len(recipient_requests) == 1:
+            article, author = recipient_requests[0]
+            msg = Message(
+                subject = 'Request to publish article',
+                reply_to = [author.username, author.email],
+                html = render_template('/email/email-request-to-publish-article.html',
+                    article=article, author=author))
+        else:
+            msg = Message(
+                subject = f'{len(recipient_requests)} requests to publish articles',
+                html = render_template('/email/email-request-digest.html',
+                    requests=recipient_requests, frequency=frequency))
+        msg.sender = admin[0]
+        msg.bcc = [admin[0], admin[1]]
+        msg.recipients = [recipient]
+        queue_message(msg)
+
+    # Mark requests notified. The revision is left, as no content is changed
+    article_ids = [article.id for recipient_requests in requests.values()
+        for article, author in recipient_requests]
+    if article_ids:
+        db.session.execute(update(Article.__table__)
+            .where(Article.id.in_(article_ids))
+            .values(request_notified = True))
+
+    return len(requests)
+
+
+def run_request_digest(frequency):
+    """Email request digests, as scheduled by the scheduler process"""
+
+    # Import app in order to access app context outside view function
+    from easy_read import app
+
+    # Render external URLs against the site's URL
+    with app.test_request_context(base_url=app.config['SITE_URL']):
+        emails = notify_requests(frequency)
+        db.session.commit()
+        app.logger.info('Request digest (%s): %d emails queued', frequency, emails)
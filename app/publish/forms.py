@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms import IntegerField, StringField, SubmitField, FieldList, HiddenField, FormField, TextAreaField, Form
+from wtforms import IntegerField, StringField, SubmitField, FieldList, HiddenField, FormField, TextAreaField, SelectField, Form
 from wtforms.validators import DataRequired, Email
 
 
@@ -52,4 +52,12 @@ class ImageForm(FlaskForm):
 class EmailForm(FlaskForm):
     """A form to collect and validate an email address"""
     article_id          = IntegerField('Id')
-    user_email          = StringField('Email', validators=[DataRequired(), Email()])
\ No newline at end of file
+    user_email          = StringField('Email', validators=[DataRequired(), Email()])
+
+
+class RequestDigestForm(FlaskForm):
+    """A form to select how often a publisher is emailed publication requests"""
+    request_digest      = SelectField('Email me requests', choices=[
+                            ('immediate', 'As they are made'), 
+                            ('hourly', 'Hourly'), 
+                            ('daily', 'Daily')])
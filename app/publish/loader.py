@@ -0,0 +1,201 @@
+"""Load the full content tree of an article for display
+
+Views that display an article (view, preview, and edit) need its metadata,
+author, image, source, categories, paragraphs, paragraph images, and
+summaries. Loading these through the ORM's lazy relationships costs a round
+trip each. Instead, the tree is loaded in two queries:
+ - the article with its author, image, source, and aggregated category names
+ - the article's paragraphs with their images and summaries, as flat rows
+
+The rows are then grouped by paragraph index and ordered by summary level,
+and returned as named tuples, which templates can read but not change.
+
+Published articles do not change until republished, so their trees are also 
+serialised to a snapshot on their publishing note upon publication. Public 
+views then read the snapshot instead of re-joining the authoring tables. 
+Drafts share images with their published articles, so where a draft changes 
+a shared image's metadata, the published articles' snapshots are refreshed.
+
+Guarded views (edit, preview, publish, delete, etc.) also need the Article
+object itself, with the author, publisher, and publishing notes checked for 
+access. These are loaded once per request by author_and_publisher_access, in
+a single query, and kept on flask.g for the view.
+"""
+
+from collections import namedtuple
+
+from sqlalchemy import func, and_, or_, select
+from sqlalchemy.orm import joinedload
+
+from app import db, article_cache
+from app.models import Article, Category, Image, Paragraph, Source, Summary, User, Publisher, PublishingNote, \
+    article_category
+
+
+ArticleTree = namedtuple('ArticleTree', [
+    'id', 'title', 'description', 'status', 'author',
+    'image', 'source', 'categories', 'paragraphs'])
+ImageData = namedtuple('ImageData', ['id', 'src', 'alt', 'cite'])
+SourceData = namedtuple('SourceData', ['title', 'author', 'link', 'name', 'contact'])
+ParagraphData = namedtuple('ParagraphData', ['index', 'header', 'image', 'summaries'])
+SummaryData = namedtuple('SummaryData', ['level', 'text'])
+
+
+def load_article_tree(article_id):
+    """Return the article's content tree, or None if the article does not exist"""
+
+    # Aggregate category names in a correlated subquery to avoid row fan-out
+    category_names = db.session.query(func.array_agg(Category.name)) \
+        .join(article_category, article_category.c.category_id == Category.id) \
+        .filter(article_category.c.article_id == Article.id) \
+        .scalar_subquery()
+
+    # Get article, author, image, source, and categories
+    article = db.session.query(
+            Article.id, Article.title, Article.description, Article.status,
+            User.username,
+            Image.id, Image.src, Image.alt, Image.cite,
+            Source.article_id, Source.title, Source.author, Source.link,
+            Source.name, Source.contact,
+            category_names) \
+        .outerjoin(User, User.id == Article.author_id) \
+        .outerjoin(Image, Image.id == Article.image_id) \
+        .outerjoin(Source, Source.article_id == Article.id) \
+        .filter(Article.id == article_id).one_or_none()
+
+    if article is None:
+        return None
+
+    # Get paragraphs, paragraph images, and summaries
+    rows = db.session.query(
+            Paragraph.index, Paragraph.header,
+            Image.id, Image.src, Image.alt, Image.cite,
+            Summary.level, Summary.text) \
+        .outerjoin(Image, Image.id == Paragraph.image_id) \
+        .outerjoin(Summary, and_(
+            Summary.article_id == Paragraph.article_id,
+            Summary.paragraph_index == Paragraph.index)) \
+        .filter(Paragraph.article_id == article_id) \
+        .order_by(Paragraph.index, Summary.level).all()
+
+    return ArticleTree(
+        id = article[0],
+        title = article[1],
+        description = article[2],
+        status = article[3],
+        author = article[4],
+        image = ImageData(*article[5:9]) if article[5] is not None else None,
+        source = SourceData(*article[10:15]) if article[9] is not None else None,
+        categories = tuple(article[15] or ()),
+        paragraphs = group_paragraphs(rows))
+
+
+def load_article_access(article_id):
+    """Return the article with its author, publisher, and publishing notes
+
+    Raise NoResultFound if the article does not exist.
+    """
+
+    return db.session.query(Article) \
+        .options(
+            joinedload(Article.author),
+            joinedload(Article.publisher).joinedload(Publisher.user),
+            joinedload(Article.is_published),
+            joinedload(Article.has_draft)) \
+        .filter(Article.id == article_id).one()
+
+
+def group_paragraphs(rows):
+    """Group flat paragraph and summary rows into a tuple of paragraphs
+
+    Rows must be ordered by paragraph index, then summary level.
+    """
+
+    paragraphs = []
+    for index, header, image_id, src, alt, cite, level, text in rows:
+
+        # Start a new paragraph upon change of index
+        if not paragraphs or paragraphs[-1]['index'] != index:
+            paragraphs.append({
+                'index': index,
+                'header': header,
+                'image': ImageData(image_id, src, alt, cite) if image_id is not None else None,
+                'summaries': []})
+
+        # Add summary to current paragraph
+        if level is not None:
+            paragraphs[-1]['summaries'].append(SummaryData(level, text))
+
+    return tuple(ParagraphData(
+        index = paragraph['index'],
+        header = paragraph['header'],
+        image = paragraph['image'],
+        summaries = tuple(paragraph['summaries']))
+        for paragraph in paragraphs)
+
+
+def serialise_article_tree(tree):
+    """Return the article tree as JSON-compatible dictionaries and lists"""
+
+    data = tree._asdict()
+    data['image'] = tree.image._asdict() if tree.image else None
+    data['source'] = tree.source._asdict() if tree.source else None
+    data['categories'] = list(tree.categories)
+    data['paragraphs'] = [{
+        'index': paragraph.index,
+        'header': paragraph.header,
+        'image': paragraph.image._asdict() if paragraph.image else None,
+        'summaries': [summary._asdict() for summary in paragraph.summaries]}
+        for paragraph in tree.paragraphs]
+    return data
+
+
+def deserialise_article_tree(data):
+    """Return the article tree from its serialised snapshot"""
+
+    return ArticleTree(
+        id = data['id'],
+        title = data['title'],
+        description = data['description'],
+        status = data['status'],
+        author = data['author'],
+        image = ImageData(**data['image']) if data['image'] else None,
+        source = SourceData(**data['source']) if data['source'] else None,
+        categories = tuple(data['categories']),
+        paragraphs = tuple(ParagraphData(
+            index = paragraph['index'],
+            header = paragraph['header'],
+            image = ImageData(**paragraph['image']) if paragraph['image'] else None,
+            summaries = tuple(SummaryData(**summary) 
+                for summary in paragraph['summaries']))
+            for paragraph in data['paragraphs']))
+
+
+def snapshot_article(publishing_note):
+    """Store a snapshot of the publishing note's published article tree
+
+    Pending changes to the published article are flushed by the loader's 
+    queries, so the snapshot includes them.
+    """
+
+    tree = load_article_tree(publishing_note.published_article_id)
+    publishing_note.snapshot = serialise_article_tree(tree)
+
+
+def refresh_image_snapshots(image_ids):
+    """Refresh the snapshots and cached pages of published articles showing the images"""
+
+    if not image_ids:
+        return
+
+    # Get publishing notes of published articles showing the images
+    notes = db.session.query(PublishingNote) \
+        .join(Article, Article.id == PublishingNote.published_article_id) \
+        .filter(or_(
+            Article.image_id.in_(image_ids),
+            Article.id.in_(select(Paragraph.article_id)
+                .where(Paragraph.image_id.in_(image_ids))))).all()
+
+    for note in notes:
+        snapshot_article(note)
+        article_cache.invalidate(note)
@@ -35,6 +35,11 @@ This document is laid out in the following structure:
     - standard library
     - 3rd party
     - local
+ - helpers
+    - article data
+    - revisions
+    - images
+ - error handlers
  - decorators
     - admin
     - publisher
@@ -50,14 +55,19 @@ This document is laid out in the following structure:
         - remove
     - requests
         - display
+        - set digest
     - articles displays
         - admin
         - publisher
         - author
     - article actions
         - add image
+        - sign and confirm image upload
+        - upload and serve locally stored image
         - create
         - edit
+        - submit (JSON create and edit)
+        - autosave
         - preview
         - request
         - review
@@ -75,23 +85,290 @@ This document is laid out in the following structure:
 # || Imports
 
 import os
+import io
 import functools
 import datetime
-import requests
+from uuid import uuid4
 
-from flask import render_template, redirect, url_for, flash, request, current_app, abort
+from flask import render_template, redirect, url_for, flash, request, current_app, abort, session, \
+    send_from_directory, g
 from flask_login import login_required, current_user
 from flask_mail import Message
-from sqlalchemy import update, or_, and_
+from flask_wtf.csrf import validate_csrf
+from wtforms.validators import ValidationError
+from sqlalchemy import update, exists, or_, and_
+from sqlalchemy.orm.exc import StaleDataError
 from werkzeug.utils import secure_filename
-import boto3
-from botocore.client import Config
+from werkzeug.http import is_resource_modified
 
-from app import db, mail, scheduled_delete
+from app import db, article_cache, user_cache
+from app.outbox import queue_message
 from app.publish import bp
-from app.publish.forms import ArticleForm, ImageForm, EmailForm
-from app.publish.utils import validate_image, delete_unused_image
-from app.models import Article, Source, Category, Image, Paragraph, Summary, User, Publisher, PublishingNote
+from app.publish.forms import ArticleForm, ImageForm, EmailForm, RequestDigestForm
+from app.publish.utils import validate_image, article_validators, conditional_response, \
+    article_image_ids, delete_images, delete_stored_images_later
+from app.publish.schema import ArticleDataError, read_json_body, article_form_data, paragraph_changes, \
+    image_upload, uploaded_image
+from app.publish.storage import storage
+from app.publish.digests import notify_requests
+from app.publish.loader import load_article_tree, load_article_access, deserialise_article_tree, snapshot_article
+from app.publish.saver import resolve_categories, save_categories, save_paragraphs, insert_paragraphs, \
+    article_images, update_images, clone_article_content, to_id, claim_revision, apply_paragraph_changes, \
+    transition_article
+from app.models import Article, Source, Image, User, Publisher, PublishingNote
+
+
+# || Helpers
+
+def create_article_from_data(data):
+    """Create a new article with the current user as author from submitted data
+
+    Data is keyed by ArticleForm field name, whether from the form itself or
+    converted from JSON.
+    """
+
+    # Create Article object
+    article = Article(
+        title = data['article_title'],
+        description = data['article_desc'],
+        image_id = to_id(data['article_image_id']),
+        author_id = current_user.id,
+        status = 'draft')
+    
+    # Add and flush Article object to get article ID
+    db.session.add(article)
+    db.session.flush()
+
+    # Update Image objects
+    update_images(article_images(data))
+
+    # Create and add Source object
+    source = Source(
+        article_id = article.id,
+        title = data['source_title'],
+        author = data['source_author'],
+        link = data['source_link'],
+        name = data['source_name'],
+        contact = data['source_contact'])
+    db.session.add(source)
+
+    # Add categories
+    article.categories = resolve_categories(data['article_category'])
+
+    # Add paragraphs and summaries
+    insert_paragraphs(article, data['paragraph'])
+
+    return article
+
+
+def get_article_json(parse=article_form_data):
+    """Return the parsed JSON request body, or an error
+
+    Check the CSRF token sent in the X-CSRFToken header, as the body bypasses
+    the form's own check.
+    """
+
+    try:
+        if current_app.config.get('WTF_CSRF_ENABLED', True):
+            validate_csrf(request.headers.get('X-CSRFToken'))
+        return parse(read_json_body()), None
+    except ValidationError:
+        return None, 'The form has expired. Please refresh the page and try again.'
+    except ArticleDataError as error:
+        return None, str(error)
+
+
+def expected_revision():
+    """Return the article revision the client last read, if sent
+
+    Scripts send the revision they last read as an If-Match header, and forms
+    as a revision field. Requests sending neither are not checked.
+    """
+
+    if request.if_match:
+        expected = next(iter(request.if_match.as_set()), None)
+    else:
+        expected = request.values.get('revision')
+    if expected is None:
+        return None
+    try:
+        return int(expected)
+    except ValueError:
+        abort(400)
+
+
+def revision_conflict(article):
+    """Return whether the client expected a different revision of the article"""
+
+    expected = expected_revision()
+    return expected is not None and expected != article.revision
+
+
+def conflict_response():
+    """Refuse a change to an article saved since the client last read it
+
+    Return 409 to scripts. Return forms to the page they came from.
+    """
+
+    message = 'That article has been changed since you opened it. Please refresh the page and try again.'
+    if request.if_match or request.is_json:
+        return {'error': message}, 409
+    flash(message, 'error')
+    return redirect(request.referrer or url_for('publish.display_author_articles'))
+
+
+def transition_refused(article_id, message, endpoint, category='error'):
+    """Refuse to move an article that was not in a status it could move from
+
+    Report a conflict instead if the article has been changed since the client
+    last read it.
+    """
+
+    db.session.rollback()
+    article = db.session.query(Article) \
+        .filter_by(id = article_id).one_or_none()
+    if article is not None and revision_conflict(article):
+        return conflict_response()
+    flash(message, category)
+    return redirect(url_for(endpoint))
+
+
+def edit_blocked(article):
+    """Return the reason a published article cannot be edited, if any"""
+
+    if article.has_draft:
+        draft_article = db.session.query(Article) \
+            .filter_by(id = article.has_draft.draft_article_id).one()
+        if draft_article.status == 'pub_requested':
+            return 'The author of that article has requested an update. Please review the request before making changes.'
+        if draft_article.status == 'pub_pending':
+            return 'You are currently reviewing that article. Please publish or reject the requested changes.'
+    return None
+
+
+def update_article_from_data(article, data):
+    """Update the article from submitted data
+
+    Data is keyed by ArticleForm field name, whether from the form itself or
+    converted from JSON.
+    """
+
+    # Update article status 
+    if article.status == 'published':
+        article.status = 'pub_draft'
+    if article.status == 'pub_live':
+        draft_article = db.session.query(Article) \
+            .filter_by(id = article.has_draft.draft_article_id).one_or_none()
+        if draft_article:
+            draft_article.status = 'pub_draft';
+        
+        # Deactivate published articles to allow admin review
+        db.session.execute(update(PublishingNote)
+            .where(PublishingNote.published_article_id == article.id)
+            .values(
+                date_updated = datetime.date.today(),
+                is_active = False))
+
+        # Invalidate cached page of published article
+        article_cache.invalidate(article.has_draft)
+
+    # Update Article object
+    article.title = data['article_title']
+    article.description = data['article_desc']
+
+    article.image_id = to_id(data['article_image_id'])
+
+    # Update Image objects
+    update_images(article_images(data))
+
+    # Update Source object
+    db.session.execute(update(Source)
+        .where(Source.article_id == article.id)
+        .values(
+            title = data['source_title'],
+            author = data['source_author'],
+            link = data['source_link'],
+            name = data['source_name'],
+            contact = data['source_contact']))
+    
+    # Update categories
+    save_categories(article, data['article_category'])
+
+    # Update paragraphs and summaries
+    save_paragraphs(article, data['paragraph'])
+
+    # Refresh snapshot of published article
+    if article.has_draft:
+        snapshot_article(article.has_draft)
+
+
+def image_extension(filename):
+    """Return the extension of an image, as named by imghdr, or abort
+
+    Abort if the extension is not permitted.
+    """
+
+    # Get extension
+    file_ext = os.path.splitext(secure_filename(filename))[1].lower()
+
+    # Convert .jpg to .jpeg for imghdr image validation
+    if file_ext == ".jpg":
+        file_ext = ".jpeg"
+
+    if file_ext not in current_app.config.get('UPLOAD_EXTENSIONS'):
+        abort(400)
+    return file_ext
+
+
+def image_filename(filename):
+    """Return a new, unique stored name and the extension of an uploaded image
+
+    Name each upload by the uploader's ID and a random ID, so that no upload 
+    ever replaces an image stored already. 
+    """
+
+    file_ext = image_extension(filename)
+    return f'{current_user.id}-{uuid4().hex}{file_ext}', file_ext
+
+
+def is_own_image_filename(filename):
+    """Return whether the stored name is one given to the current user's uploads"""
+
+    prefix = f'{current_user.id}-'
+    name, file_ext = os.path.splitext(filename)
+    return name.startswith(prefix) \
+        and len(name) == len(prefix) + 32 \
+        and all(char in '0123456789abcdef' for char in name[len(prefix):])
+
+
+def create_image(filename):
+    """Record an image uploaded to cloud storage
+    
+    Images left unused in an article are deleted by a periodic sweep (see 
+    sweep_unused_images).
+    """
+
+    # Create database object
+    image = Image(
+        src = storage.url(filename))
+    
+    # Add object to session 
+    db.session.add(image)
+
+    # Record changes
+    db.session.commit()
+
+    return image
+
+
+# || Error Handlers
+
+@bp.errorhandler(StaleDataError)
+def stale_article_error(error):
+    """Refuse a change to an article saved by another request since it loaded"""
+
+    db.session.rollback()
+    return conflict_response()
 
 
 # || Decorators
@@ -135,18 +412,16 @@ def author_and_publisher_access(func):
          - live articles, to prevent unauthorised changes to live content.
          - draft articles that are undergoing review, to prevent race conditions 
            where unchecked changes are published.
+
+        Keep the article loaded on flask.g, as g.article, for the view.
         """
 
         admin = current_app.config.get('ADMIN')
 
-        # Get article
-        article_id = request.args.get('article-id')
-        article = db.session.query(Article) \
-            .filter_by(id = article_id).one()
-
-        # Get article author
-        article_author = db.session.query(User) \
-            .filter_by(id = article.author_id).one()
+        # Get article, author, publisher, and publishing notes
+        article = load_article_access(request.args.get('article-id'))
+        article_author = article.author
+        g.article = article
 
         # Get user route
         user_route = request.args.get('user-route')
@@ -155,13 +430,11 @@ def author_and_publisher_access(func):
         if article.publisher_id:
 
             # Get article's publisher 
-            article_publisher = db.session.query(Publisher, User) \
-                .outerjoin(User, User.id == Publisher.user_id) \
-                .filter(Publisher.id == article.publisher_id).one_or_none()
+            article_publisher = article.publisher.user if article.publisher else None
         
             # Grant access to author and article's publisher
             if current_user != article_author \
-                    and current_user != article_publisher['User'] \
+                    and current_user != article_publisher \
                     and current_user.email not in admin:
                 # Report extra feedback to publishers upon access denial
                 if user_route == 'display-requests':
@@ -173,7 +446,7 @@ def author_and_publisher_access(func):
             
             # Grant access to article's publisher only
             if article.status in ('pending', 'pub_pending', 'pub_live') \
-                    and current_user != article_publisher['User'] \
+                    and current_user != article_publisher \
                     and current_user.email not in admin:
                 # Report extra feedback to authors upon denial
                 if article.status in ('pending', 'pub_pending'):
@@ -260,10 +533,11 @@ def add_publisher():
             sender = current_app.config['ADMIN'][0], 
             html = render_template('/email/email-request-to-become-publisher.html'),
             recipients = [user.email])
-        mail.send(msg)
+        queue_message(msg)
 
         # Record and alert
         db.session.commit()    
+        user_cache.invalidate(user.id)
         flash('Publisher successfully added.', 'success')
 
         # Return publisher to publisher's articles page
@@ -316,6 +590,7 @@ def remove_publisher():
     
     # Record and alert
     db.session.commit()
+    user_cache.invalidate(publisher['User'].id)
     flash('Publisher successfully removed.', 'success')
 
     # Return author to author's articles page
@@ -332,31 +607,34 @@ def display_writers():
     and those that have not. 
 
     Publishers can add and remove writers from this view. 
+
+    Writers are separated using a single query over the publisher's published
+    articles, rather than loading each writer's articles in turn.
     """
 
     # Get email form
     form = EmailForm()
 
-    # Get current user as publisher 
-    publisher = db.session.query(Publisher) \
-        .filter_by(id = current_user.is_publisher.id).one()
-
     # Get current publisher's writers
-    writers = publisher.writers
+    writers = db.session.query(User) \
+        .filter_by(published_by = current_user.is_publisher.id).all()
+
+    # Get authors with articles published by current publisher
+    published_author_ids = {author_id for author_id, in db.session.query(Article.author_id) \
+        .join(PublishingNote, PublishingNote.draft_article_id == Article.id) \
+        .filter(Article.publisher_id == current_user.is_publisher.id) \
+        .distinct()}
 
-    # Separate published writers from unpublished
-    unpublished_writers = writers[:] # Copy all
+    # Separate published writers from unpublished (excluding self)
     published_writers = []
+    unpublished_writers = []
     for writer in writers:
-        if writer.id == current_user.id \
-                and writer in unpublished_writers: 
-            unpublished_writers.remove(writer) # Remove self
-        for article in writer.authored_articles:
-            if article.is_published \
-                and article.publisher_id == current_user.is_publisher.id \
-                and writer in unpublished_writers:
-                    unpublished_writers.remove(writer) # Remove from unpub'd
-                    published_writers.append(writer) # Add to pub'd
+        if writer.id == current_user.id:
+            continue
+        if writer.id in published_author_ids:
+            published_writers.append(writer)
+        else:
+            unpublished_writers.append(writer)
     
     # Render publisher's articles pages
     return render_template('/publish/publisher-writers.html',
@@ -406,10 +684,11 @@ def add_writer():
             html = render_template('/email/email-request-to-become-writer.html',
                         publisher=current_user),
             recipients = [user.email])
-        mail.send(msg)
+        queue_message(msg)
 
         # Record and alert
         db.session.commit()    
+        user_cache.invalidate(user.id)
         flash('Writer successfully added.', 'success')
 
         # Return publisher to publisher's articles page
@@ -464,6 +743,7 @@ def remove_writer():
     
     # Record and alert
     db.session.commit()    
+    user_cache.invalidate(writer.id)
     flash('Writer successfully removed.', 'success')
 
     # Return publisher to publisher's articles page
@@ -505,11 +785,51 @@ def display_requests():
         .filter(and_(User.published_by == None,
                 Article.publisher_id == None)).all()
 
+    # Get request email frequency
+    digest_form = None
+    if current_user.is_publisher:
+        digest_form = RequestDigestForm(
+            request_digest = current_user.is_publisher.request_digest)
+
     # Render requests to publish
     return render_template('/publish/publisher-requests.html',
         associated=associated,
         disassociated=disassociated,
-        unassociated=unassociated) 
+        unassociated=unassociated,
+        digest_form=digest_form) 
+
+
+@bp.route('/set-request-digest', methods=['POST'])
+@login_required
+@all_publishers_access
+def set_request_digest():
+    """Set how often the current publisher is emailed publication requests
+
+    Email any requests still waiting for a digest upon switching to immediate
+    emails, as digests no longer include them.
+    """
+
+    form = RequestDigestForm()
+
+    if current_user.is_publisher and form.validate_on_submit():
+
+        # Update publisher 
+        current_user.is_publisher.request_digest = form.request_digest.data
+        db.session.flush()
+
+        # Email waiting requests
+        if form.request_digest.data == 'immediate':
+            notify_requests('immediate', recipient_email=current_user.email)
+
+        # Record and alert
+        db.session.commit()
+        user_cache.invalidate(current_user.id)
+        flash('Your request emails have been updated.', 'success')
+    else:
+        flash('Your request emails could not be updated.', 'error')
+
+    # Return publisher to requests page
+    return redirect(url_for('publish.display_requests'))
 
 
 @bp.route('/display-admin-articles')
@@ -595,7 +915,11 @@ def display_author_articles():
 def add_image():
     """Upload image to database and cloud storage and return image ID
     
-    Schedule uploaded images for deletion if unused in an article. 
+    Images left unused in an article are deleted by a periodic sweep.
+
+    The file passes through the server, limited by MAX_CONTENT_LENGTH. The
+    article editor uploads to cloud storage directly instead (see 
+    sign_image_upload).
     """
 
     # Get image form data
@@ -609,59 +933,18 @@ def add_image():
         # If a file is selected 
         if file.filename != '':
 
-            # Validate filename
-            filename = secure_filename(file.filename)
-            filename = str(current_user.id) + '-' + filename
-            
-            # Get its extension
-            file_ext = os.path.splitext(filename)[1]
-
-            # Convert .jpg to .jpeg for imghdr image validation
-            if file_ext == ".jpg":
-                file_ext = ".jpeg"
+            # Validate filename and get its extension
+            filename, file_ext = image_filename(file.filename)
 
-            # Abort if the file extension is not permitted or file is invalid (see function)
-            if file_ext not in current_app.config.get('UPLOAD_EXTENSIONS') \
-                    or file_ext != validate_image(file.stream):
+            # Abort if the file is invalid (see function)
+            if file_ext != validate_image(file.stream):
                 abort(400)
 
-            # Get Amazon s3 bucket
-            s3_bucket = current_app.config.get('FLASKS3_BUCKET_NAME')
-
-            # Initialise s3 client
-            s3 = boto3.client('s3', 'eu-west-2', 
-                config = Config(signature_version = 's3v4'))
-
-            # Generate s3 presigned URL
-            presigned_post = s3.generate_presigned_post(
-                Bucket = s3_bucket,
-                Key = filename,
-                Fields = {'Content-Type': file_ext, 'acl': 'public-read'},
-                Conditions = [
-                    {'acl': 'public-read'},
-                    {'Content-Type': file_ext}],
-                ExpiresIn = 3600)
-
-            # Post presigned URL to upload media to Amazon s3
-            http_response = requests.post(
-                presigned_post['url'], 
-                data=presigned_post['fields'], 
-                files={'file': file.read()})
+            # Upload image to storage
+            storage.put(filename, file.read(), 'image/' + file_ext[1:])
 
         # Create database object
-        image = Image(
-            src = 'https://an-easy-read.s3.amazonaws.com/%s' % (filename))
-        
-        # Add object to session 
-        db.session.add(image)
-
-        # Record changes
-        db.session.commit()
-
-        if not current_app.testing:
-            # Schedule image for deletion if not used
-            scheduled_delete.add_job(delete_unused_image, 'interval', hours=4,
-                id=str(image.id), kwargs={'image': filename, 'job_id': image.id})
+        image = create_image(filename)
 
         # return image ID
         return {
@@ -672,6 +955,127 @@ def add_image():
     abort(400)
 
 
+@bp.route('/sign-image-upload', methods=['POST'])
+@login_required
+def sign_image_upload():
+    """Return a presigned POST for the browser to upload an image directly
+
+    The browser uploads the file to cloud storage itself, so that no worker is
+    held for the transfer and images are not limited by MAX_CONTENT_LENGTH. 
+    The POST is signed for the image's name, content type, and at most 
+    MAX_IMAGE_LENGTH bytes, and expires after 10 minutes. 
+
+    The upload must then be confirmed by confirm_image_upload.
+    """
+
+    # Get image data
+    upload, error = get_article_json(parse=image_upload)
+    if error:
+        return {'error': error}, 400
+    filename, size = upload
+
+    # Halt images not permitted
+    filename, file_ext = image_filename(filename)
+    max_length = current_app.config['MAX_IMAGE_LENGTH']
+    if size > max_length:
+        return {'error': 'The image is too large.'}, 413
+
+    # Generate presigned POST
+    presigned_post = storage.presigned_post(
+        filename, 'image/' + file_ext[1:], max_length)
+
+    return {
+        'url': presigned_post['url'],
+        'fields': presigned_post['fields'],
+        'image_name': filename}
+
+
+@bp.route('/confirm-image-upload', methods=['POST'])
+@login_required
+def confirm_image_upload():
+    """Validate an image uploaded directly to cloud storage and return image ID
+
+    Only accept names signed for the current user's uploads, which storage 
+    only holds if uploaded with a presigned POST, and not yet confirmed.
+
+    Read only the image's header from storage, with a ranged GET, and check 
+    that it matches the image's extension. Delete uploads that do not.
+    """
+
+    # Get image name
+    filename, error = get_article_json(parse=uploaded_image)
+    if error:
+        return {'error': error}, 400
+
+    # Halt images not uploaded by the current user
+    if not is_own_image_filename(filename):
+        abort(400)
+    file_ext = image_extension(filename)
+
+    # Halt images already confirmed
+    confirmed = db.session.query(Image.id) \
+        .filter(Image.src == storage.url(filename)).first()
+    if confirmed:
+        return {'error': 'The image has already been uploaded.'}, 409
+
+    # Get image header from storage
+    header = storage.read_header(filename)
+    if header is None:
+        return {'error': 'The image has not been uploaded.'}, 400
+
+    # Delete invalid image (see function), which no Image references
+    if file_ext != validate_image(io.BytesIO(header)):
+        storage.delete(filename)
+        abort(400)
+
+    # Create database object
+    image = create_image(filename)
+
+    # return image ID
+    return {
+        'image_id': image.id,
+        'image_name': filename}, 201
+
+
+@bp.route('/upload-stored-image', methods=['POST'])
+def upload_stored_image():
+    """Store an image posted directly by the browser to local storage
+
+    Stand in for Amazon S3 when STORAGE_TYPE is 'local', enforcing the policy
+    signed by sign_image_upload.
+    """
+
+    if not storage.is_local:
+        abort(404)
+
+    # Get signed policy
+    policy = storage.backend.check_policy(request.form.get('policy', ''))
+    if policy is None:
+        abort(403)
+    key, content_type, max_length = policy
+
+    # Halt uploads not matching the policy
+    file = request.files.get('file')
+    if file is None or request.form.get('key') != key \
+            or request.form.get('Content-Type') != content_type:
+        abort(400)
+    data = file.read(max_length + 1)
+    if not data or len(data) > max_length:
+        abort(400)
+
+    storage.put(key, data, content_type)
+    return '', 204
+
+
+@bp.route('/uploads/<path:key>')
+def stored_image(key):
+    """Serve an image from local storage"""
+
+    if not storage.is_local:
+        abort(404)
+    return send_from_directory(storage.backend.directory, key)
+
+
 @bp.route('/create-article', methods=['GET', 'POST'])
 @login_required
 def create_article():
@@ -683,7 +1087,8 @@ def create_article():
     
     For Category, Paragraph, and Summary models, which are related to the
     Article model many-to-one, iterate over the form FieldList in order to 
-    access the data.
+    access the data. Paragraphs, summaries, and image metadata are each 
+    written in a single statement.
     """
 
     # Get article form data
@@ -691,83 +1096,8 @@ def create_article():
 
     if form.validate_on_submit():         
     
-        # Create Article object
-        article = Article(
-            title = form.article_title.data,
-            description = form.article_desc.data,
-            image_id = form.article_image_id.data,
-            author_id = current_user.id,
-            status = 'draft')
-        
-        # Add and flush Article object to get article ID
-        db.session.add(article)
-        db.session.flush()
-
-        # Update Image object
-        if form.article_image_id.data:
-            db.session.execute(update(Image)
-                .where(Image.id == form.article_image_id.data)
-                .values(
-                    alt = form.article_image_alt.data,
-                    cite = form.article_image_cite.data,
-                    used = True))
-
-        # Create and add Source object
-        source = Source(
-            article_id = article.id,
-            title = form.source_title.data,
-            author = form.source_author.data,
-            link = form.source_link.data,
-            name = form.source_name.data,
-            contact = form.source_contact.data)
-        db.session.add(source)
-
-        # Add categories
-        for category in form.article_category.data:
-
-            # Create new Category objects for new categories
-            category_in_database = db.session.query(Category) \
-                .filter_by(name = category).one_or_none()
-            if category_in_database is None:
-                category_in_database = Category(name = category)
-
-            # Append categories to article
-            article.categories.append(category_in_database)
-
-        # Add paragraphs
-        for paragraph in form.paragraph.data:
-
-            # Create new Paragraph objects
-            paragraph_in_database = Paragraph(
-                index = paragraph['paragraph_index'],
-                header = paragraph['paragraph_header'])
-            if paragraph['paragraph_image_id']:
-                paragraph_in_database.image_id = paragraph['paragraph_image_id']
-            
-            # Update Image object
-            if paragraph['paragraph_image_id']:
-                db.session.execute(update(Image)
-                    .where(Image.id == paragraph['paragraph_image_id'])
-                    .values(
-                        alt = paragraph['paragraph_image_alt'],
-                        cite = paragraph['paragraph_image_cite'],
-                        used = True))
-            
-            # Append paragraphs to article
-            article.paragraphs.append(paragraph_in_database)
-
-            # Add summaries
-            for summary in paragraph['summary']:
-
-                # Create new Summary objects
-                summary_in_database = Summary(
-                    article_id = article.id,
-                    paragraph_index = paragraph['paragraph_index'],
-                    level = summary['level'],
-                    text = summary['text'])
-                           
-                # Append summaries to article
-                article.summaries.append(summary_in_database)
+        # Create article from form data
+        create_article_from_data(form.data)
 
         # Record and alert
         db.session.commit()    
@@ -790,8 +1120,8 @@ def edit_article():
     objects from the validated data submitted by the author or publisher.
     
     For Category, Paragraph, and Summary models, which are related to the
-    Article model many-to-one, first delete the article's collections, then 
-    iterate over the form FieldList in order to access the updated data.
+    Article model many-to-one, compare the form FieldList data against the 
+    stored rows, and insert, update, or delete only those that have changed.
     This allows content to be added as well as removed.
 
     If an article is published, ensure that its draft version is not currently
@@ -804,20 +1134,13 @@ def edit_article():
     form = ArticleForm() 
 
     # Get article
-    article_id = request.args.get('article-id')
-    article = db.session.query(Article) \
-        .filter_by(id = article_id).one()
+    article = g.article
 
     # Protect requested, published articles
-    if article.has_draft:
-        draft_article = db.session.query(Article) \
-            .filter_by(id = article.has_draft.draft_article_id).one()
-        if draft_article.status == 'pub_requested':
-            flash('The author of that article has requested an update. Please review the request before making changes.', 'info')
-            return redirect(url_for('publish.display_publisher_articles'))
-        if draft_article.status == 'pub_pending':
-            flash('You are currently reviewing that article. Please publish or reject the requested changes.', 'info')
-            return redirect(url_for('publish.display_publisher_articles'))
+    message = edit_blocked(article)
+    if message:
+        flash(message, 'info')
+        return redirect(url_for('publish.display_publisher_articles'))
 
     # Alert user as to the function of form submission
     if request.method == 'GET':
@@ -828,101 +1151,12 @@ def edit_article():
 
     if form.validate_on_submit():
 
-        # Update article status 
-        if article.status == 'published':
-            article.status = 'pub_draft'
-        if article.status == 'pub_live':
-            draft_article = db.session.query(Article) \
-                .filter_by(id = article.has_draft.draft_article_id).one_or_none()
-            if draft_article:
-                draft_article.status = 'pub_draft';
-            
-            # Deactivate published articles to allow admin review
-            db.session.execute(update(PublishingNote)
-                .where(PublishingNote.published_article_id == article.id)
-                .values(
-                    date_updated = datetime.date.today(),
-                    is_active = False))
-
-        # Update Article object
-        article.title = form.article_title.data
-        article.description = form.article_desc.data
-
-        article.image_id = form.article_image_id.data
-
-        # Update Image object
-        if form.article_image_id.data:
-            db.session.execute(update(Image)
-                .where(Image.id == form.article_image_id.data)
-                .values(
-                    alt = form.article_image_alt.data,
-                    cite = form.article_image_cite.data,
-                    used = True))
-
-        # Update Source object
-        db.session.execute(update(Source)
-            .where(Source.article_id == article.id)
-            .values(
-                title = form.source_title.data,
-                author = form.source_author.data,
-                link = form.source_link.data,
-                name = form.source_name.data,
-                contact = form.source_contact.data))
-        
-        # Delete article's collections
-        article.categories = []
-        article.paragraphs = []
-        article.summaries = []
+        # Protect changes saved since the form was loaded
+        if revision_conflict(article):
+            return conflict_response()
 
-        # Flush to ensure deletion emitted before insertion 
-        db.session.flush()
-
-        # Update categories
-        for category in form.article_category.data:
-
-            # Create new Category objects for new categories
-            category_in_database = db.session.query(Category) \
-                .filter_by(name = category).one_or_none()
-            if category_in_database is None:
-                category_in_database = Category(name=category)
-
-            # Append categories to article
-            article.categories.append(category_in_database)
-
-        # Update paragraphs
-        for paragraph in form.paragraph.data:
-
-            # Create new Paragraph objects
-            paragraph_in_database = Paragraph(
-                index = paragraph['paragraph_index'],
-                header = paragraph['paragraph_header'])
-            if paragraph['paragraph_image_id']:
-                paragraph_in_database.image_id = paragraph['paragraph_image_id']
-
-            # Update Image objects
-            if paragraph['paragraph_image_id']:
-                db.session.execute(update(Image)
-                    .where(Image.id == paragraph['paragraph_image_id'])
-                    .values(
-                        alt = paragraph['paragraph_image_alt'],
-                        cite = paragraph['paragraph_image_cite'],
-                        used = True))
-
-            # Append paragraphs to article
-            article.paragraphs.append(paragraph_in_database)
-
-            # Update summaries
-            for summary in paragraph['summary']:
-
-                # Create new Summary objects
-                summary_in_database = Summary(
-                    article_id = article.id,
-                    paragraph_index = paragraph['paragraph_index'],
-                    level = summary['level'],
-                    text = summary['text'])
-                            
-                # Append summaries to article
-                article.summaries.append(summary_in_database)
+        # Update article from form data
+        update_article_from_data(article, form.data)
 
         # Record and alert
         db.session.commit()    
@@ -932,25 +1166,133 @@ def edit_article():
         return redirect(url_for('publish.display_author_articles'))
 
     # Get article data
-    source = article.source
-    categories = article.categories
-    article_image = db.session.query(Image) \
-        .filter_by(id = article.image_id).one_or_none()
-    paragraphs = db.session.query(Paragraph, Image) \
-        .outerjoin(Image, Image.id == Paragraph.image_id) \
-        .filter(Paragraph.article_id == article.id) \
-        .order_by(Paragraph.index).all()
-    summaries = article.summaries
+    revision = article.revision
+    article = load_article_tree(article.id)
 
     # Render prefilled article form (edit mode)  
     return render_template('/publish/edit-article.html', 
         form=form, 
+        revision=revision,
         article=article, 
-        source=source, 
-        categories=categories, 
-        article_image=article_image,
-        paragraphs=paragraphs,
-        summaries=summaries)
+        source=article.source, 
+        categories=article.categories, 
+        article_image=article.image,
+        paragraphs=article.paragraphs)
+
+
+@bp.route('/submit-article', methods=['POST'])
+@login_required
+def submit_article():
+    """Create a new article from JSON submitted by the article editor
+
+    Save the article exactly as create_article does, without binding the 
+    nested ArticleForm. Return the URL to continue to, or the reason the 
+    article was rejected.
+    """
+
+    # Get article data
+    data, error = get_article_json()
+    if error:
+        return {'error': error}, 400
+
+    # Create article from data
+    article = create_article_from_data(data)
+
+    # Record and alert
+    db.session.commit()    
+    flash('Article successfully saved.', 'success')
+
+    return {
+        'article_id': article.id,
+        'redirect': url_for('publish.display_author_articles')}, 201
+
+
+@bp.route('/submit-article-edit', methods=['POST'])
+@login_required
+@author_and_publisher_access
+def submit_article_edit():
+    """Update the selected article from JSON submitted by the article editor
+
+    Save the article exactly as edit_article does, without binding the nested
+    ArticleForm. Return the URL to continue to, or the reason the article 
+    was rejected.
+    """
+
+    # Get article
+    article = g.article
+
+    # Protect requested, published articles, and changes saved since loaded
+    message = edit_blocked(article)
+    if message:
+        return {'error': message}, 409
+    if revision_conflict(article):
+        return conflict_response()
+
+    # Get article data
+    data, error = get_article_json()
+    if error:
+        return {'error': error}, 400
+
+    # Update article from data
+    update_article_from_data(article, data)
+
+    # Record and alert
+    db.session.commit()    
+    flash('Article successfully saved.', 'success')
+
+    return {
+        'article_id': article.id,
+        'revision': article.revision,
+        'redirect': url_for('publish.display_author_articles')}
+
+
+@bp.route('/autosave-article', methods=['PATCH'])
+@login_required
+@author_and_publisher_access
+def autosave_article():
+    """Save changes to individual paragraphs of the selected article
+
+    Called by the article editor as the author or publisher writes. Only the
+    paragraphs, headers, images, and summary levels changed are sent, and only 
+    those are written.
+
+    Each change set names the revision it was made from. If the article has
+    been saved since, refuse the changes so that neither save overwrites the 
+    other. Live articles are not autosaved, as saving takes them offline.
+    """
+
+    # Get article
+    article = g.article
+
+    # Protect requested, published, and live articles
+    message = edit_blocked(article)
+    if message is None and article.status == 'pub_live':
+        message = 'Live articles are not autosaved. Save the article to submit changes for review.'
+    if message:
+        return {'error': message}, 409
+
+    # Get changes
+    changes, error = get_article_json(paragraph_changes)
+    if error:
+        return {'error': error}, 400
+    revision, changes = changes
+
+    # Claim next revision, updating the status of published drafts
+    values = {'status': 'pub_draft'} if article.status == 'published' else {}
+    revision = claim_revision(article, revision, **values)
+    if revision is None:
+        db.session.rollback()
+        return {
+            'error': 'This article has been saved elsewhere. Please refresh the page to continue editing.',
+            'revision': article.revision}, 409
+
+    # Apply changes
+    changes_made = apply_paragraph_changes(article, changes)
+
+    # Record
+    db.session.commit()
+
+    return {'revision': revision, 'changes': dict(changes_made)}
 
 
 @bp.route('/preview-article')
@@ -959,30 +1301,16 @@ def edit_article():
 def preview_article():
     """Display the selected article as it would be seen live"""
 
-    # Get article
-    article_id = request.args.get('article-id')
-    article = db.session.query(Article) \
-        .filter_by(id = article_id).one()
-
     # Get article data
-    source = article.source
-    categories = article.categories
-    article_image = db.session.query(Image) \
-        .filter_by(id = article.image_id).one_or_none()
-    paragraphs = db.session.query(Paragraph, Image) \
-        .outerjoin(Image, Image.id == Paragraph.image_id) \
-        .filter(Paragraph.article_id == article.id) \
-        .order_by(Paragraph.index).all()
-    summaries = article.summaries
+    article = load_article_tree(g.article.id)
     
     # Render article  
     return render_template('/publish/preview-article.html', 
         article=article, 
-        source=source, 
-        categories=categories, 
-        article_image=article_image,
-        paragraphs=paragraphs,
-        summaries=summaries)
+        source=article.source, 
+        categories=article.categories, 
+        article_image=article.image,
+        paragraphs=article.paragraphs)
 
 
 @bp.route('/request-article')
@@ -991,9 +1319,10 @@ def preview_article():
 def request_article():
     """Request the selected article to be published
 
-    Send an email requesting publication to the article's assigned publisher. 
-    If none exists, email the author's associated publisher. If still none 
-    exists, email admin. 
+    Email the request to the article's assigned publisher. If none exists, 
+    email the author's associated publisher. If still none exists, email 
+    admin. Publishers who receive requests in digests are emailed later (see 
+    app/publish/digests.py).
 
     Send the email from admin and set it to reply to the article's author. 
     BCC admin to keep a record of communiciation. 
@@ -1003,51 +1332,23 @@ def request_article():
         flash('<div>Please confirm your email address. Click to <a href="/resend-email-confirmation">resend confirmation</a>.</div>', 'info')
         return redirect(url_for('publish.display_author_articles'))
 
-    # Get article 
+    # Request article, if not already requested, stopping author from 
+    # spamming requests. Published drafts are requested again as updates
     article_id = request.args.get('article-id')
-    article = db.session.query(Article) \
-        .filter_by(id = article_id).one()
-
-    # Stop author from spamming requests
-    if article.status in ('requested', 'pub_requested'): 
-        flash('A request to publish has already been made.', 'info')
-        return redirect(url_for('publish.display_author_articles'))
-
-    # Get article author
-    author = db.session.query(User) \
-        .filter_by(id = article.author_id).one()
-
-    # Compose email
-    msg = Message(
-        subject = 'Request to publish article',
-        reply_to = [author.username, author.email],
-        sender = current_app.config['ADMIN'][0], # email.easyread@gmail.com
-        bcc = [current_app.config['ADMIN'][0], current_app.config['ADMIN'][1]], # me
-        html = render_template('/email/email-request-to-publish-article.html', article=article))
-
-    # Get article's assigned publisher and author's associated publisher
-    article_publisher = db.session.query(Publisher, User) \
-        .outerjoin(User, User.id == Publisher.user_id) \
-        .filter(Publisher.id == article.publisher_id).one_or_none()
-    author_publisher = db.session.query(Publisher, User) \
-        .outerjoin(User, User.id == Publisher.user_id) \
-        .filter(Publisher.id == author.published_by).one_or_none()
-
-    # Send email to publisher 
-    if article_publisher:
-        msg.recipients = [article_publisher['User'].email]
-    else:
-        if author_publisher:
-            msg.recipients = [author_publisher['User'].email]    
-        else: 
-            msg.recipients = [current_app.config['ADMIN'][1]] # me
-    mail.send(msg)
-
-    # Update article status
-    if article.is_published:
-        article.status = 'pub_requested'
-    else: 
-        article.status = 'requested'
+    requested = transition_article(article_id, 
+        {'draft': 'requested', 'pub_draft': 'pub_requested', 'published': 'pub_requested'},
+        revision = expected_revision(),
+        request_notified = False)
+    if requested is None:
+        if g.article.status in ('requested', 'pub_requested'):
+            message = 'A request to publish has already been made.'
+        else:
+            message = 'That article cannot be requested at this time.'
+        return transition_refused(article_id, message, 
+            'publish.display_author_articles', 'info')
+
+    # Email publisher, if they receive requests immediately
+    notify_requests('immediate', article_ids=[requested.id])
 
     # Record and alert
     db.session.commit()    
@@ -1070,42 +1371,40 @@ def review_article():
     
     Upon selecting to review a request, assign the article to the publisher and 
     associate the author to the publisher.
+
+    The article is claimed by a single conditional update, so that of two 
+    publishers selecting the same request, only one is assigned the article.
     """
 
-    # Get article
     article_id = request.args.get('article-id')
-    article = db.session.query(Article) \
-        .filter_by(id = article_id).one()
-
-    # Get author
-    author = db.session.query(User) \
-        .filter_by(id = article.author_id).one()
-
-    # Halt invalid review requests 
-    # Article is not requested
-    if article.status not in ('requested', 'pub_requested'): 
-        flash('You do not have access to do that.', 'error')
-        return redirect(url_for('publish.display_requests'))
-    # Article is published but the current user is not the publisher
-    if article.is_published and article.publisher_id != current_user.is_publisher.id:
-        flash('You do not have access to do that.', 'error')
-        return redirect(url_for('publish.display_requests'))
-
-    # Update status
-    if article.status == 'pub_requested':
-        article.status = 'pub_pending'
-    else:
-        article.status = 'pending' 
-
-    # Assign article to publisher
-    article.publisher_id = current_user.is_publisher.id
+    publisher_id = current_user.is_publisher.id
+
+    # Claim article, halting invalid review requests:
+    #  - article is not requested
+    #  - article is published but the current user is not the publisher
+    #  - article has changed since the request was displayed
+    article = Article.__table__
+    is_published = exists().where(PublishingNote.draft_article_id == article.c.id)
+    claimed = transition_article(article_id,
+        {'requested': 'pending', 'pub_requested': 'pub_pending'},
+        revision = expected_revision(),
+        where = [or_(~is_published, article.c.publisher_id == publisher_id)],
+        publisher_id = publisher_id)
+    if claimed is None:
+        return transition_refused(article_id, 
+            'You do not have access to do that.', 'publish.display_requests')
  
     # Associate writer to publisher and report changes
-    if article.is_published is None:
-        if author.published_by != current_user.is_publisher.id:
-            author.published_by = current_user.is_publisher.id
-
+    if claimed.status == 'pending':
+        author = User.__table__
+        recruited = db.session.execute(update(author)
+            .where(author.c.id == claimed.author_id)
+            .where(author.c.published_by.is_distinct_from(publisher_id))
+            .values(published_by = publisher_id)
+            .returning(author.c.id)).first()
+        if recruited:
             db.session.commit()
+            user_cache.invalidate(recruited.id)
             flash('<div>You are now reviewing a <a href="/display-publisher-articles">new article</a>. You have also recruited a <a href="/display-writers">new writer</a>.</div>', 'success')
             return redirect(url_for('publish.display_requests'))
 
@@ -1130,16 +1429,14 @@ def reject_article():
     publisher, in order to encourage continuity and community.
     """
 
-    # Get article
+    # Update article status, if still under review
     article_id = request.args.get('article-id')
-    article = db.session.query(Article) \
-        .filter_by(id = article_id).one()
-
-    # Update article status
-    if article.is_published:
-        article.status = 'pub_draft'
-    else:
-        article.status = 'draft'
+    rejected = transition_article(article_id,
+        {'pending': 'draft', 'pub_pending': 'pub_draft'},
+        revision = expected_revision())
+    if rejected is None:
+        return transition_refused(article_id, 
+            'That article is not under review.', 'publish.display_publisher_articles')
 
     # Record and alert
     db.session.commit()    
@@ -1168,63 +1465,40 @@ def publish_article():
 
     Set the published article to inactive in preparation for admin approval.
 
-    *Instantiate new objects for Article, Source, Category, Paragraph, and 
-    Summary models, and serialise directly from the selected article, using 
-    the article's collections where the data is related many-to-one.
+    Store a snapshot of the published article's content on its publishing note,
+    from which the article is displayed publically.
+
+    *Instantiate a new Article object, then copy the selected article's Source, 
+    Category, Paragraph, and Summary rows to it inside the database.
     """
 
     # Get draft article
-    draft_article_id = request.args.get('article-id')
-    draft_article = db.session.query(Article) \
-        .filter_by(id = draft_article_id).one()
-
-    # Halt articles not under review
-    if draft_article.status not in ("pending", "pub_pending"):
-        flash('You do not have access to do that.', 'error')
-        return redirect(url_for('publish.display_requests'))
+    draft_article = g.article
+    draft_article_id = draft_article.id
+
+    # Update draft article status, halting articles not under review and 
+    # articles changed since the publisher last displayed them
+    draft = transition_article(draft_article_id,
+        {'pending': 'published', 'pub_pending': 'published'},
+        revision = expected_revision())
+    if draft is None:
+        return transition_refused(draft_article_id, 
+            'You do not have access to do that.', 'publish.display_requests')
 
     # Copy Article object 
     published_article = Article(
-        title = draft_article.title,
-        description = draft_article.description,
-        author_id = draft_article.author_id,
+        title = draft.title,
+        description = draft.description,
+        author_id = draft.author_id,
         publisher_id = current_user.is_publisher.id,
-        image_id = draft_article.image_id)
+        image_id = draft.image_id)
 
     # Add and flush Article object to get published article ID
     db.session.add(published_article)
     db.session.flush()
 
-    # Copy article source
-    source_copy = Source(
-        title = draft_article.source.title,
-        author = draft_article.source.author,
-        link = draft_article.source.link,
-        name = draft_article.source.name,
-        contact = draft_article.source.contact)
-    published_article.source = source_copy
-
-    # Copy categories
-    for category in draft_article.categories:
-        published_article.categories.append(category)
-
-    # Copy paragraphs
-    for paragraph in draft_article.paragraphs:
-        paragraph_copy = Paragraph(
-            article_id = published_article.id,
-            index = paragraph.index,
-            header = paragraph.header,
-            image_id = paragraph.image_id)
-        published_article.paragraphs.append(paragraph_copy) 
-
-    # Copy summaries
-    for summary in draft_article.summaries:
-        summary_copy = Summary(
-            article_id = summary.article_id,
-            paragraph_index = summary.paragraph_index,
-            level = summary.level,
-            text = summary.text)    
-        published_article.summaries.append(summary_copy)
+    # Copy article source, categories, paragraphs, and summaries
+    clone_article_content(draft_article.id, published_article.id)
 
     if draft_article.is_published:
 
@@ -1234,13 +1508,15 @@ def publish_article():
         db.session.delete(outdated_article)
        
         # Update publishing note
-        publishing_note = db.session.query(PublishingNote) \
-            .filter_by(id = draft_article.is_published.id).one()
+        publishing_note = draft_article.is_published
         publishing_note.published_article_id = published_article.id
         publishing_note.date_updated = datetime.date.today()
         publishing_note.to_slug(published_article.title)
         publishing_note.is_active = False
 
+        # Invalidate cached page of outdated article
+        article_cache.invalidate(publishing_note)
+
     else:
 
         # Create new publishing note
@@ -1252,9 +1528,11 @@ def publish_article():
         publishing_note.to_slug(published_article.title)
         db.session.add(publishing_note)
 
-    # Update article statuses
-    draft_article.status = 'published'
+    # Update published article status
     published_article.status = 'pub_live'
+
+    # Store snapshot of published article for public view
+    snapshot_article(publishing_note)
                     
     # Record and alert
     db.session.commit()    
@@ -1277,6 +1555,7 @@ def activate_article():
     
     # Activate article
     article['PublishingNote'].is_active = True
+    article_cache.invalidate(article['PublishingNote'])
 
     # Record and alert
     db.session.commit()    
@@ -1299,6 +1578,7 @@ def deactivate_article():
     
     # Deactivate article
     article['PublishingNote'].is_active = False
+    article_cache.invalidate(article['PublishingNote'])
 
     # Record and alert
     db.session.commit()    
@@ -1314,16 +1594,13 @@ def deactivate_article():
 def update_article():
     """Update the selected draft article to its published version
     
-    Update the draft's Article and Source models directly from the published
-    version. For Category, Paragraph, and Summary models, which are related to 
-    the Article model many-to-one, first delete the draft article's collections, 
-    then reappend the content from the published article's collections.  
+    Update the draft's Article model directly from the published version. 
+    Replace the draft's Source, Category, Paragraph, and Summary content with 
+    copies of the published article's, made inside the database.
     """
 
     # Get draft and published articles
-    draft_article_id = request.args.get('article-id')
-    draft_article = db.session.query(Article) \
-        .filter_by(id = draft_article_id).one()
+    draft_article = g.article
     published_article = db.session.query(Article) \
         .filter_by(id = draft_article.is_published.published_article_id).one()
 
@@ -1334,47 +1611,11 @@ def update_article():
             title = published_article.title,
             description = published_article.description,
             image_id = published_article.image_id,
-            status = 'published'))
-
-    # Update draft Source object
-    db.session.execute(update(Source)
-        .where(Source.article_id == draft_article.id)
-        .values(
-            title = published_article.source.title,
-            author = published_article.source.author,
-            link = published_article.source.link,
-            name = published_article.source.name,
-            contact = published_article.source.contact))
-        
-    # Delete draft article's collections   
-    draft_article.categories = []
-    draft_article.paragraphs = []
-    draft_article.summaries = [] 
+            status = 'published',
+            revision = Article.revision + 1))
 
-    # Flush to ensure deletion emitted before insertion 
-    db.session.flush()
-
-    # Update draft categories
-    for category in published_article.categories:
-        draft_article.categories.append(category)
-
-    # Copy paragraphs
-    for paragraph in published_article.paragraphs:
-        paragraph_copy = Paragraph(
-            article_id = published_article.id,
-            index = paragraph.index,
-            header = paragraph.header,
-            image_id = paragraph.image_id)
-        draft_article.paragraphs.append(paragraph_copy) 
-
-    # Copy summaries
-    for summary in published_article.summaries:
-        summary_copy = Summary(
-            article_id = summary.article_id,
-            paragraph_index = summary.paragraph_index,
-            level = summary.level,
-            text = summary.text)    
-        draft_article.summaries.append(summary_copy)
+    # Replace draft source, categories, paragraphs, and summaries
+    clone_article_content(published_article.id, draft_article.id, replace=True)
     
     # Record and alert
     db.session.commit()    
@@ -1430,6 +1671,7 @@ def transfer_article():
         publishingNote = db.session.query(PublishingNote) \
             .filter_by(published_article_id = article.id).one()
         publishingNote.is_active = True
+        article_cache.invalidate(publishingNote)
 
         # Update article status
         article.status = 'pub_live'
@@ -1456,8 +1698,8 @@ def delete_article():
     Source, Paragraph, and Summary model objects.
 
     If and article has no published version, delete all Image model objects 
-    from the database and delete the related image file from Amazon S3 cloud 
-    storage.
+    from the database and delete the related image files from cloud storage 
+    once committed, off the request thread.
 
     If an article is published, create the appearance of deletion by taking
     the article offline and reassigning it to admin. This is in effort to 
@@ -1469,9 +1711,7 @@ def delete_article():
     """
 
     # Get article
-    article_id = request.args.get('article-id')
-    article = db.session.query(Article) \
-        .filter_by(id = article_id).one()
+    article = g.article
 
     if article.has_draft: # Publisher's version of published article
 
@@ -1491,6 +1731,7 @@ def delete_article():
         db.session.execute(update(PublishingNote)
             .where(PublishingNote.published_article_id == article.id)
             .values(is_active = False))
+        article_cache.invalidate(article.has_draft)
 
         # Update article status
         article.status = 'pub_deleted'
@@ -1502,29 +1743,20 @@ def delete_article():
         # Return author to author's articles page
         return redirect(url_for('publish.display_publisher_articles'))
 
-    # Delete article images from database and cloud storage
+    # Get article images
+    image_ids = []
     if not article.is_published:
-        article_image = db.session.query(Image) \
-            .filter_by(id = article.image_id).first()
-        if article_image:
-            db.session.delete(article_image)
-            article_image_filename = os.path.basename(article_image.src)
-            boto3.resource('s3').Object(
-                os.environ['FLASKS3_BUCKET_NAME'], article_image_filename).delete()
-        for paragraph in article.paragraphs:
-            paragraph_image = db.session.query(Image) \
-                .filter_by(id = paragraph.image_id).first()
-            if paragraph_image:
-                db.session.delete(paragraph_image)
-                paragraph_image_filename = os.path.basename(paragraph_image.src)
-                boto3.resource('s3').Object(
-                    os.environ['FLASKS3_BUCKET_NAME'], paragraph_image_filename).delete()
+        image_ids = article_image_ids(article.id)
     
-    # Delete article
+    # Delete article, then its images from database, recording them for 
+    # deletion from cloud storage
     db.session.delete(article)
+    db.session.flush()
+    deletion_ids = delete_images(image_ids)
 
     # Record and alert
     db.session.commit()    
+    delete_stored_images_later(deletion_ids)
     flash('Article successfully deleted.', 'success')
 
     # Return author to author's articles page
@@ -1540,8 +1772,8 @@ def permadelete_article():
     Source, Paragraph, and Summary model objects.
 
     If and article has no draft version, delete all Image model objects 
-    from the database and delete the related image file from Amazon S3 cloud 
-    storage.
+    from the database and delete the related image files from cloud storage 
+    once committed, off the request thread.
 
     If an article is published, reset its draft version's status and assignment,
     and delete the related PublishingNote model object.
@@ -1552,6 +1784,7 @@ def permadelete_article():
     article = db.session.query(Article) \
         .filter_by(id = article_id).one()
 
+    image_ids = []
     if article.has_draft: # Publisher's version of published article
 
         # Update draft article
@@ -1565,32 +1798,23 @@ def permadelete_article():
         pub_note = db.session.query(PublishingNote, Article) \
             .join(Article, Article.id == PublishingNote.published_article_id) \
             .filter(Article.id == article.id).one()
+        article_cache.invalidate(pub_note['PublishingNote'])
         db.session.delete(pub_note['PublishingNote'])
 
     else: # Published article has no draft version
 
-        # Delete article images from database and cloud storage
-        article_image = db.session.query(Image) \
-            .filter_by(id = article.image_id).first()
-        if article_image:
-            db.session.delete(article_image)
-            article_image_filename = os.path.basename(article_image.src)
-            boto3.resource('s3').Object(
-                os.environ['FLASKS3_BUCKET_NAME'], article_image_filename).delete()
-        for paragraph in article.paragraphs:
-            paragraph_image = db.session.query(Image) \
-                .filter_by(id = paragraph.image_id).first()
-            if paragraph_image:
-                db.session.delete(paragraph_image)
-                paragraph_image_filename = os.path.basename(paragraph_image.src)
-                boto3.resource('s3').Object(
-                    os.environ['FLASKS3_BUCKET_NAME'], paragraph_image_filename).delete()
-
-    # Delete article
+        # Get article images
+        image_ids = article_image_ids(article.id)
+
+    # Delete article, then its images from database, recording them for 
+    # deletion from cloud storage
     db.session.delete(article)
+    db.session.flush()
+    deletion_ids = delete_images(image_ids)
 
     # Record and alert
     db.session.commit()    
+    delete_stored_images_later(deletion_ids)
     flash('Article successfully deleted.', 'success')
    
     # Return to admin's articles page
@@ -1607,6 +1831,13 @@ def view_article(id, slug=None):
     
     Restore a published article's partial, misspelt, or missing URL slug using 
     the article's publishing note.
+
+    Serve anonymous readers from the rendered page cache. Pages are cached 
+    against the publishing note's content version, which is bumped whenever 
+    the published article changes.
+
+    Answer anonymous readers' conditional requests from the publishing note 
+    alone, returning 304 Not Modified before any content is loaded.
     """
 
     # Get publishing note from URL
@@ -1621,31 +1852,44 @@ def view_article(id, slug=None):
 
     if publishing_note.is_active:
 
-        # Get article and article data
-        article = db.session.query(Article) \
-            .filter_by(id = publishing_note.published_article_id).one()
-        source = article.source
-        categories = article.categories
-        article_image = db.session.query(Image) \
-            .filter_by(id = article.image_id).one_or_none()
-        paragraphs = db.session.query(Paragraph, Image) \
-            .outerjoin(Image, Image.id == Paragraph.image_id) \
-            .filter(Paragraph.article_id == article.id) \
-            .order_by(Paragraph.index).all()
-        summaries = article.summaries
+        # Serve cached page to readers without user-specific content
+        cacheable = not current_user.is_authenticated \
+            and '_flashes' not in session
+        if cacheable:
+
+            # Return 304 if reader's copy is current
+            etag, last_modified = article_validators(publishing_note)
+            if request.method in ('GET', 'HEAD') \
+                    and not is_resource_modified(request.environ, 
+                        etag=etag, last_modified=last_modified):
+                return conditional_response('', etag, last_modified, 304)
+
+            page = article_cache.get(publishing_note)
+            if page is not None:
+                return conditional_response(page, etag, last_modified)
+
+        # Get article and article data from snapshot
+        if publishing_note.snapshot:
+            article = deserialise_article_tree(publishing_note.snapshot)
+        else:
+            article = load_article_tree(publishing_note.published_article_id)
         
-        # Render article  
-        return render_template('/publish/view-article.html', 
+        # Render and cache article  
+        page = render_template('/publish/view-article.html', 
             article=article,
             publishing_note=publishing_note,
-            source=source, 
-            categories=categories, 
-            article_image=article_image,
-            paragraphs=paragraphs,
-            summaries=summaries)
+            source=article.source, 
+            categories=article.categories, 
+            article_image=article.image,
+            paragraphs=article.paragraphs)
+        if cacheable:
+            article_cache.set(publishing_note, page)
+            return conditional_response(page, etag, last_modified)
+        return page
 
     else: # Article marked inactive
 
         # Alert and return to index
         flash('That article is currently offline.', 'error')
-        return redirect(url_for('main.index'))
\ No newline at end of file
+        return redirect(url_for('main.index'))
+
@@ -0,0 +1,410 @@
+"""Save submitted article content against the stored content tree
+
+Saving an edited article by deleting and re-creating all of its categories,
+paragraphs, and summaries rewrites every row for a single changed word,
+leaving dead rows for Postgres to vacuum. Instead, submitted content is
+compared against stored content by key:
+ - categories by name
+ - paragraphs by index
+ - summaries by paragraph index and level
+
+Only the rows that were added, changed, or removed are inserted, updated, or
+deleted. Each save function returns a count of the rows it changed.
+
+New articles are written with one multi-row INSERT each for paragraphs and 
+summaries, and image metadata with one UPDATE ... FROM (VALUES ...). 
+Publication copies an article's content wholesale, so it is cloned inside 
+Postgres with INSERT ... SELECT. Both take the same number of statements 
+regardless of the article's length.
+"""
+
+from collections import Counter
+
+from sqlalchemy import insert, update, delete, select, literal, values, column, case, or_, Integer, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from app.models import Article, Category, Image, Paragraph, Source, Summary, article_category
+from app.publish.loader import refresh_image_snapshots
+
+
+def to_id(value):
+    """Convert a submitted ID, which may be blank, to an integer or None"""
+    return int(value) if value not in (None, '') else None
+
+
+def resolve_categories(names):
+    """Return the named categories in order, creating any that are new
+
+    Look up all names in one query, then insert the missing ones in another.
+    The unique index on category name makes the insert skip any that a 
+    concurrent save has just created, which are then looked up again.
+    """
+
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+
+    # Get existing categories
+    categories = {category.name: category for category in 
+        db.session.query(Category).filter(Category.name.in_(names))}
+
+    # Insert new categories
+    missing = [name for name in names if name not in categories]
+    if missing:
+        inserted = db.session.execute(pg_insert(Category)
+            .values([{'name': name} for name in missing])
+            .on_conflict_do_nothing(index_elements=['name'])
+            .returning(Category.id, Category.name))
+
+        # Add inserted rows to session without reloading them
+        for id, name in inserted:
+            category = Category(id = id, name = name)
+            make_transient_to_detached(category)
+            db.session.add(category)
+            categories[name] = category
+
+        # Get categories created concurrently
+        conflicted = [name for name in missing if name not in categories]
+        if conflicted:
+            categories.update({category.name: category for category in
+                db.session.query(Category).filter(Category.name.in_(conflicted))})
+
+    return [categories[name] for name in names]
+
+
+def save_categories(article, names):
+    """Link the article to the named categories, creating any that are new
+
+    Assigning the collection links and unlinks only the categories that
+    differ from those stored.
+    """
+
+    changes = Counter()
+    stored = {category.name for category in article.categories}
+
+    article.categories = resolve_categories(names)
+    changes['inserted'] += len(set(names) - stored)
+    changes['deleted'] += len(stored - set(names))
+    return changes
+
+
+def insert_paragraphs(article, paragraphs):
+    """Insert a new article's paragraphs and summaries
+
+    Paragraphs are submitted as dictionaries of form data, each with a list of
+    summary dictionaries. Rows are written by one multi-row INSERT per table.
+    """
+
+    paragraph_rows = []
+    summary_rows = []
+    for paragraph in paragraphs:
+        index = int(paragraph['paragraph_index'])
+        paragraph_rows.append({
+            'article_id': article.id,
+            'index': index,
+            'header': paragraph['paragraph_header'],
+            'image_id': to_id(paragraph['paragraph_image_id'])})
+        for summary in paragraph['summary']:
+            summary_rows.append({
+                'article_id': article.id,
+                'paragraph_index': index,
+                'level': int(summary['level']),
+                'text': summary['text']})
+
+    if paragraph_rows:
+        db.session.execute(insert(Paragraph).values(paragraph_rows))
+    if summary_rows:
+        db.session.execute(insert(Summary).values(summary_rows))
+
+
+def article_images(data):
+    """Return the metadata of the article and paragraph images submitted"""
+
+    images = []
+    if data['article_image_id']:
+        images.append({
+            'id': to_id(data['article_image_id']),
+            'alt': data['article_image_alt'],
+            'cite': data['article_image_cite']})
+    for paragraph in data['paragraph']:
+        if paragraph['paragraph_image_id']:
+            images.append({
+                'id': to_id(paragraph['paragraph_image_id']),
+                'alt': paragraph['paragraph_image_alt'],
+                'cite': paragraph['paragraph_image_cite']})
+    return images
+
+
+def update_images(images):
+    """Update the metadata of images and mark them as used
+
+    Write all images in one UPDATE ... FROM (VALUES ...), skipping rows left 
+    unchanged. Where an image is submitted more than once, its last metadata
+    is kept.
+
+    Drafts share Image rows with their published articles, so refresh the 
+    snapshots of published articles showing the images changed.
+    """
+
+    images = list({image['id']: image for image in images}.values())
+    if not images:
+        return
+
+    submitted = values(
+            column('id', Integer), column('alt', String), column('cite', String),
+            name='submitted') \
+        .data([(image['id'], image['alt'], image['cite']) for image in images])
+    changed = db.session.execute(update(Image)
+        .where(Image.id == submitted.c.id)
+        .where(or_(
+            Image.alt.is_distinct_from(submitted.c.alt),
+            Image.cite.is_distinct_from(submitted.c.cite),
+            Image.used.isnot(True)))
+        .values(
+            alt = submitted.c.alt,
+            cite = submitted.c.cite,
+            used = True)
+        .returning(Image.id)
+        .execution_options(synchronize_session=False)).scalars().all()
+
+    refresh_image_snapshots(changed)
+
+
+def save_paragraphs(article, paragraphs):
+    """Insert, update, and delete the article's paragraphs and summaries
+
+    Paragraphs are submitted as dictionaries of form data, each with a list of
+    summary dictionaries.
+    """
+
+    changes = Counter()
+
+    # Get stored paragraphs and summaries
+    stored_paragraphs = {paragraph.index: paragraph for paragraph in
+        db.session.query(Paragraph) \
+            .options(selectinload(Paragraph.summaries)) \
+            .filter(Paragraph.article_id == article.id)}
+    stored_summaries = {(summary.paragraph_index, summary.level): summary
+        for paragraph in stored_paragraphs.values()
+        for summary in paragraph.summaries}
+
+    submitted_paragraphs = set()
+    submitted_summaries = set()
+    for paragraph in paragraphs:
+        index = int(paragraph['paragraph_index'])
+        header = paragraph['paragraph_header']
+        image_id = to_id(paragraph['paragraph_image_id'])
+        submitted_paragraphs.add(index)
+
+        # Insert new paragraphs and update changed ones
+        stored = stored_paragraphs.get(index)
+        if stored is None:
+            db.session.add(Paragraph(
+                article_id = article.id,
+                index = index,
+                header = header,
+                image_id = image_id))
+            changes['inserted'] += 1
+        elif (stored.header, stored.image_id) != (header, image_id):
+            stored.header = header
+            stored.image_id = image_id
+            changes['updated'] += 1
+
+        for summary in paragraph['summary']:
+            key = (index, int(summary['level']))
+            submitted_summaries.add(key)
+
+            # Insert new summaries and update changed ones
+            stored = stored_summaries.get(key)
+            if stored is None:
+                db.session.add(Summary(
+                    article_id = article.id,
+                    paragraph_index = key[0],
+                    level = key[1],
+                    text = summary['text']))
+                changes['inserted'] += 1
+            elif stored.text != summary['text']:
+                stored.text = summary['text']
+                changes['updated'] += 1
+
+    # Delete removed summaries, then removed paragraphs
+    for key in stored_summaries.keys() - submitted_summaries:
+        db.session.delete(stored_summaries[key])
+        changes['deleted'] += 1
+    for index in stored_paragraphs.keys() - submitted_paragraphs:
+        db.session.delete(stored_paragraphs[index])
+        changes['deleted'] += 1
+
+    return changes
+
+
+def claim_revision(article, expected, **values):
+    """Increment the article's revision if it is still the revision expected
+
+    The check and increment are a single conditional UPDATE, so of two saves
+    based on the same revision, only one can claim the next. Any further 
+    column values given are set in the same statement. Return the new 
+    revision, or None if the article has been saved since.
+    """
+
+    revision = db.session.execute(update(Article.__table__)
+        .where(Article.id == article.id)
+        .where(Article.revision == expected)
+        .values(revision = Article.revision + 1, **values)
+        .returning(Article.revision)).scalar()
+    if revision is not None:
+        set_committed_value(article, 'revision', revision)
+        for key, value in values.items():
+            set_committed_value(article, key, value)
+    return revision
+
+
+def transition_article(article_id, transitions, revision=None, where=(), **values):
+    """Move the article to its next status if it is in one of the statuses given
+
+    Transitions map each status the article may be in to its next status. The
+    check and the move are a single conditional UPDATE ... RETURNING, so of
+    two requests racing to move the same article, only one succeeds.
+
+    The revision expected and further conditions may also be given, as may
+    further column values to set. Return the updated row, or None if the
+    article is not in a status given or fails a condition. If the article is
+    loaded in the session, it is updated to match.
+    """
+
+    article = Article.__table__
+    statement = update(article) \
+        .where(article.c.id == article_id) \
+        .where(article.c.status.in_(list(transitions))) \
+        .values(
+            status = case(transitions, value=article.c.status),
+            revision = article.c.revision + 1,
+            **values) \
+        .returning(article)
+    if revision is not None:
+        statement = statement.where(article.c.revision == revision)
+    for condition in where:
+        statement = statement.where(condition)
+    row = db.session.execute(statement).one_or_none()
+
+    # Update loaded article without reloading it
+    loaded = db.session.identity_map.get(identity_key(Article, article_id))
+    if row is not None and loaded is not None:
+        for key in ('status', 'revision', *values):
+            set_committed_value(loaded, key, row._mapping[key])
+    return row
+
+
+def apply_paragraph_changes(article, changes):
+    """Apply an autosaved change set to the article's paragraphs and summaries
+
+    Changes are keyed by paragraph index, as returned by paragraph_changes. 
+    Only the paragraphs changed are loaded, and only the fields changed are 
+    written.
+    """
+
+    changes_made = Counter()
+
+    # Get changed paragraphs and their summaries
+    stored_paragraphs = {paragraph.index: paragraph for paragraph in
+        db.session.query(Paragraph) \
+            .options(selectinload(Paragraph.summaries)) \
+            .filter(Paragraph.article_id == article.id) \
+            .filter(Paragraph.index.in_(list(changes)))}
+
+    images = []
+    for index, change in changes.items():
+        stored = stored_paragraphs.get(index)
+
+        # Delete removed paragraphs and their summaries
+        if change is None:
+            if stored is not None:
+                changes_made['deleted'] += 1 + len(stored.summaries)
+                db.session.delete(stored)
+            continue
+
+        # Insert new paragraphs
+        if stored is None:
+            stored = Paragraph(article_id = article.id, index = index, header = '')
+            db.session.add(stored)
+            changes_made['inserted'] += 1
+        elif 'header' in change or 'image' in change:
+            changes_made['updated'] += 1
+
+        # Update header and image
+        if 'header' in change:
+            stored.header = change['header']
+        if 'image' in change:
+            image_id, alt, cite = change['image']
+            stored.image_id = image_id
+            if image_id is not None:
+                images.append({'id': image_id, 'alt': alt, 'cite': cite})
+
+        # Insert, update, and delete summaries
+        stored_summaries = {summary.level: summary for summary in stored.summaries}
+        for level, text in change['summaries'].items():
+            summary = stored_summaries.get(level)
+            if text is None:
+                if summary is not None:
+                    db.session.delete(summary)
+                    changes_made['deleted'] += 1
+            elif summary is None:
+                db.session.add(Summary(
+                    article_id = article.id,
+                    paragraph_index = index,
+                    level = level,
+                    text = text))
+                changes_made['inserted'] += 1
+            elif summary.text != text:
+                summary.text = text
+                changes_made['updated'] += 1
+
+    update_images(images)
+    return changes_made
+
+
+def clone_article_content(from_article_id, to_article_id, replace=False):
+    """Copy an article's source, categories, paragraphs, and summaries
+
+    If replace is set, first delete the content of the article copied to.
+    Rows are copied by INSERT ... SELECT, so no content is loaded into Python.
+    Flush pending changes first, so that both articles exist and the copied 
+    content is current.
+    """
+
+    db.session.flush()
+
+    # Delete content of article copied to, children first
+    if replace:
+        db.session.execute(delete(Summary)
+            .where(Summary.article_id == to_article_id))
+        db.session.execute(delete(Paragraph)
+            .where(Paragraph.article_id == to_article_id))
+        db.session.execute(delete(article_category)
+            .where(article_category.c.article_id == to_article_id))
+        db.session.execute(delete(Source)
+            .where(Source.article_id == to_article_id))
+
+    # Copy content, parents first
+    article_id = literal(to_article_id)
+    db.session.execute(insert(Source).from_select(
+        ['article_id', 'title', 'author', 'link', 'name', 'contact'],
+        select(article_id, Source.title, Source.author, Source.link,
+               Source.name, Source.contact) \
+            .where(Source.article_id == from_article_id)))
+    db.session.execute(insert(article_category).from_select(
+        ['article_id', 'category_id'],
+        select(article_id, article_category.c.category_id) \
+            .where(article_category.c.article_id == from_article_id)))
+    db.session.execute(insert(Paragraph).from_select(
+        ['article_id', 'index', 'header', 'image_id'],
+        select(article_id, Paragraph.index, Paragraph.header, Paragraph.image_id) \
+            .where(Paragraph.article_id == from_article_id)))
+    db.session.execute(insert(Summary).from_select(
+        ['article_id', 'paragraph_index', 'level', 'text'],
+        select(article_id, Summary.paragraph_index, Summary.level, Summary.text) \
+            .where(Summary.article_id == from_article_id)))
@@ -0,0 +1,244 @@
+"""Read articles submitted as JSON by the article editor
+
+Submitting an article as an ArticleForm requires WTForms-style field names,
+such as paragraph-3-summary-2-text, for every field of every paragraph.
+Url-encoding long articles inflates them towards the request size limit, and
+binding them to nested FieldLists instantiates a form per paragraph and
+summary. Instead, the editor can submit a compact JSON document, optionally
+gzipped, which is parsed by the standard library and checked in a single pass:
+
+{
+    "title": "...",
+    "description": "...",
+    "image": {"id": 1, "alt": "...", "cite": "..."} or null,
+    "source": {"title": "...", "author": "...", "link": "...",
+               "name": "...", "contact": "..."},
+    "categories": ["...", ...],
+    "paragraphs": [
+        {"header": "...", "image": {...} or null, "summaries": ["...", ...]},
+        ...
+    ]
+}
+
+Paragraph indices and summary levels are given by array position, from 1.
+The document is converted to data keyed by ArticleForm field name, so that it
+can be saved exactly as form data is.
+
+The editor also autosaves changes to individual paragraphs as they are made,
+keyed by stored paragraph index and summary level. Null removes a paragraph or
+summary, and omitted fields are left unchanged:
+
+{
+    "revision": 3,
+    "paragraphs": {
+        "2": {"header": "...", "image": {...} or null, 
+              "summaries": {"1": "...", "3": null}},
+        "5": null
+    }
+}
+
+Images are uploaded by the browser directly to storage. The editor requests an
+upload with {"filename": "...", "size": 1234}, then confirms it with 
+{"image_name": "..."}.
+"""
+
+import json
+import zlib
+
+from flask import current_app, request
+
+
+SOURCE_FIELDS = ('title', 'author', 'link', 'name', 'contact')
+
+
+class ArticleDataError(ValueError):
+    """Raised when a submitted article is malformed"""
+
+
+def read_json_body():
+    """Return the parsed JSON request body, decompressing it if gzipped
+
+    The request size limit applies to the compressed body. The decompressed
+    body is limited separately by MAX_ARTICLE_JSON_LENGTH.
+    """
+
+    body = request.get_data(cache=False)
+    max_length = current_app.config['MAX_ARTICLE_JSON_LENGTH']
+
+    if request.headers.get('Content-Encoding') == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, max_length)
+        except zlib.error:
+            raise ArticleDataError('The article could not be decompressed.')
+        if decompressor.unconsumed_tail:
+            raise ArticleDataError('The article is too long.')
+
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise ArticleDataError('The article could not be read.')
+
+
+def text(value, field, required=False):
+    """Check a text field, returning blank text for null"""
+
+    if value is None:
+        value = ''
+    if not isinstance(value, str):
+        raise ArticleDataError(f'{field} must be text.')
+    if required and not value.strip():
+        raise ArticleDataError(f'{field} is required.')
+    return value
+
+
+def image(value, field):
+    """Check an image field, returning its ID, alt, and cite"""
+
+    if value is None:
+        return None, '', ''
+    if not isinstance(value, dict) or not isinstance(value.get('id'), int) \
+            or isinstance(value.get('id'), bool):
+        raise ArticleDataError(f'{field} must have an integer ID.')
+    return (value['id'],
+        text(value.get('alt'), f'{field} description'),
+        text(value.get('cite'), f'{field} credit'))
+
+
+def article_form_data(document):
+    """Check a submitted article and convert it to ArticleForm field data
+
+    Raise ArticleDataError upon the first problem found.
+    """
+
+    if not isinstance(document, dict):
+        raise ArticleDataError('The article must be a JSON object.')
+
+    # Get article metadata
+    image_id, image_alt, image_cite = image(document.get('image'), 'Image')
+    data = {
+        'article_title': text(document.get('title'), 'Title', required=True),
+        'article_desc': text(document.get('description'), 'Description', required=True),
+        'article_image_id': image_id,
+        'article_image_alt': image_alt,
+        'article_image_cite': image_cite}
+
+    # Get source
+    source = document.get('source') or {}
+    if not isinstance(source, dict):
+        raise ArticleDataError('Source must be an object.')
+    for field in SOURCE_FIELDS:
+        data['source_' + field] = text(source.get(field), f'Source {field}')
+
+    # Get categories
+    categories = document.get('categories') or []
+    if not isinstance(categories, list):
+        raise ArticleDataError('Categories must be a list.')
+    data['article_category'] = [text(category, 'Category', required=True)
+        for category in categories]
+
+    # Get paragraphs and summaries
+    paragraphs = document.get('paragraphs') or []
+    if not isinstance(paragraphs, list):
+        raise ArticleDataError('Paragraphs must be a list.')
+    data['paragraph'] = []
+    for index, paragraph in enumerate(paragraphs, 1):
+        if not isinstance(paragraph, dict):
+            raise ArticleDataError(f'Paragraph {index} must be an object.')
+        summaries = paragraph.get('summaries') or []
+        if not isinstance(summaries, list):
+            raise ArticleDataError(f'Paragraph {index} summaries must be a list.')
+        image_id, image_alt, image_cite = image(
+            paragraph.get('image'), f'Paragraph {index} image')
+        data['paragraph'].append({
+            'paragraph_index': index,
+            'paragraph_header': text(paragraph.get('header'), f'Paragraph {index} header'),
+            'paragraph_image_id': image_id,
+            'paragraph_image_alt': image_alt,
+            'paragraph_image_cite': image_cite,
+            'summary': [{
+                'level': level,
+                'text': text(summary, f'Paragraph {index} level {level} summary')}
+                for level, summary in enumerate(summaries, 1)]})
+
+    return data
+
+
+def key(value, field):
+    """Check a paragraph index or summary level key, returning an integer"""
+
+    try:
+        value = int(value)
+    except ValueError:
+        raise ArticleDataError(f'{field} must be a number.')
+    if value < 1:
+        raise ArticleDataError(f'{field} must be positive.')
+    return value
+
+
+def paragraph_changes(document):
+    """Check a submitted change set, returning its revision and changes
+
+    Changes are keyed by paragraph index. Each is None, to delete the 
+    paragraph, or a dictionary of the changed header, image, and summaries.
+    Raise ArticleDataError upon the first problem found.
+    """
+
+    if not isinstance(document, dict):
+        raise ArticleDataError('The changes must be a JSON object.')
+
+    revision = document.get('revision')
+    if not isinstance(revision, int) or isinstance(revision, bool):
+        raise ArticleDataError('Revision must be an integer.')
+
+    paragraphs = document.get('paragraphs') or {}
+    if not isinstance(paragraphs, dict):
+        raise ArticleDataError('Paragraphs must be an object.')
+
+    changes = {}
+    for index, paragraph in paragraphs.items():
+        index = key(index, 'Paragraph index')
+        if paragraph is None:
+            changes[index] = None
+            continue
+        if not isinstance(paragraph, dict):
+            raise ArticleDataError(f'Paragraph {index} must be an object or null.')
+
+        change = {}
+        if 'header' in paragraph:
+            change['header'] = text(paragraph['header'], f'Paragraph {index} header')
+        if 'image' in paragraph:
+            change['image'] = image(paragraph['image'], f'Paragraph {index} image')
+
+        summaries = paragraph.get('summaries') or {}
+        if not isinstance(summaries, dict):
+            raise ArticleDataError(f'Paragraph {index} summaries must be an object.')
+        change['summaries'] = {}
+        for level, summary in summaries.items():
+            level = key(level, f'Paragraph {index} summary level')
+            change['summaries'][level] = None if summary is None \
+                else text(summary, f'Paragraph {index} level {level} summary')
+
+        changes[index] = change
+
+    return revision, changes
+
+
+def image_upload(document):
+    """Check a request to upload an image, returning its filename and size"""
+
+    if not isinstance(document, dict):
+        raise ArticleDataError('The image must be a JSON object.')
+    filename = text(document.get('filename'), 'Filename', required=True)
+    size = document.get('size')
+    if not isinstance(size, int) or isinstance(size, bool) or size < 1:
+        raise ArticleDataError('Size must be a positive integer.')
+    return filename, size
+
+
+def uploaded_image(document):
+    """Check a confirmation of an uploaded image, returning its stored name"""
+
+    if not isinstance(document, dict):
+        raise ArticleDataError('The image must be a JSON object.')
+    return text(document.get('image_name'), 'Image name', required=True)
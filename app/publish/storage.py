@@ -0,0 +1,227 @@
+"""Store uploaded images in cloud storage or on the local filesystem
+
+Building a boto3 client costs tens of milliseconds and opens a new connection,
+so each process holds one client, created upon first use, whose connection
+pool is shared by all requests and threads. Clients are not shared with
+forked processes.
+
+Backends are selected by STORAGE_TYPE and share the same interface:
+ - 's3' stores images in the FLASKS3_BUCKET_NAME Amazon S3 bucket.
+ - 'local' stores images in STORAGE_DIR, served by the publish blueprint, for
+   development and tests without network access.
+
+Images are stored by key, their filename. Their public URL, from which the
+Image src is set, is given by the backend.
+"""
+
+import os
+import threading
+from time import time
+
+import boto3
+import jwt
+from botocore.client import Config
+from flask import url_for
+
+
+# S3 deletes at most 1000 objects per request
+DELETE_BATCH_SIZE = 1000
+
+
+def image_key(src):
+    """Return the storage key of an image from its src URL"""
+    return os.path.basename(src)
+
+
+class S3Storage(object):
+    """Store images in an Amazon S3 bucket"""
+
+    def __init__(self, bucket, region, base_url=None, max_connections=10):
+        self.bucket = bucket
+        self.region = region
+        self.base_url = base_url or f'https://{bucket}.s3.amazonaws.com/'
+        self.max_connections = max_connections
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Return this process's S3 client, creating it upon first use"""
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = boto3.session.Session().client('s3', self.region,
+                        config = Config(
+                            signature_version = 's3v4',
+                            max_pool_connections = self.max_connections))
+                    self._pid = os.getpid()
+        return self._client
+
+    def url(self, key):
+        return self.base_url + key
+
+    def presigned_post(self, key, content_type, max_length, expires_in):
+        return self.client.generate_presigned_post(
+            Bucket = self.bucket,
+            Key = key,
+            Fields = {'Content-Type': content_type, 'acl': 'public-read'},
+            Conditions = [
+                {'acl': 'public-read'},
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_length]],
+            ExpiresIn = expires_in)
+
+    def put(self, key, data, content_type):
+        self.client.put_object(Bucket = self.bucket, Key = key, Body = data,
+            ContentType = content_type, ACL = 'public-read')
+
+    def read_header(self, key, length=512):
+        try:
+            return self.client.get_object(Bucket = self.bucket, Key = key,
+                Range = f'bytes=0-{length - 1}')['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def delete(self, key):
+        self.client.delete_object(Bucket = self.bucket, Key = key)
+
+    def delete_many(self, keys):
+        failed = []
+        keys = list(keys)
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            response = self.client.delete_objects(Bucket = self.bucket, Delete = {
+                'Objects': [{'Key': key} for key in keys[start:start + DELETE_BATCH_SIZE]],
+                'Quiet': True})
+            failed.extend(error['Key'] for error in response.get('Errors', []))
+        return failed
+
+
+class LocalStorage(object):
+    """Store images in a local directory
+
+    Uploads are posted to the publish blueprint, with a token signing the key,
+    content type, and size limit in place of an S3 policy.
+    """
+
+    def __init__(self, directory, secret_key):
+        self.directory = directory
+        self.secret_key = secret_key
+
+    def path(self, key):
+        return os.path.join(self.directory, os.path.basename(key))
+
+    def url(self, key):
+        return url_for('publish.stored_image', key=key)
+
+    def presigned_post(self, key, content_type, max_length, expires_in):
+        token = jwt.encode({
+            'key': key,
+            'content_type': content_type,
+            'max_length': max_length,
+            'exp': time() + expires_in},
+            self.secret_key,
+            algorithm = 'HS256')
+        return {
+            'url': url_for('publish.upload_stored_image'),
+            'fields': {'key': key, 'Content-Type': content_type, 'policy': token}}
+
+    def check_policy(self, token):
+        """Return the key, content type, and size limit signed, or None"""
+        try:
+            policy = jwt.decode(token, self.secret_key, algorithms=['HS256'])
+        except jwt.PyJWTError:
+            return None
+        return policy['key'], policy['content_type'], policy['max_length']
+
+    def put(self, key, data, content_type):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(key), 'wb') as file:
+            file.write(data)
+
+    def read_header(self, key, length=512):
+        try:
+            with open(self.path(key), 'rb') as file:
+                return file.read(length)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+        return []
+
+
+class Storage(object):
+    """A Flask extension to store uploaded images
+
+    Methods
+    -------
+    url
+        Return the public URL of the image stored under the key
+    presigned_post
+        Return the URL and fields for a browser to upload an image directly
+    put
+        Store image data under the key
+    read_header
+        Return the first bytes of the stored image, or None if not stored
+    delete
+        Delete the stored image
+    delete_many
+        Delete the stored images in batches, returning the keys not deleted
+    -------
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        storage_type = app.config.get('STORAGE_TYPE', 's3')
+
+        if storage_type == 's3':
+            self.backend = S3Storage(
+                app.config['FLASKS3_BUCKET_NAME'],
+                app.config['STORAGE_REGION'],
+                base_url = app.config.get('STORAGE_URL'),
+                max_connections = app.config['STORAGE_MAX_CONNECTIONS'])
+        elif storage_type == 'local':
+            self.backend = LocalStorage(
+                app.config['STORAGE_DIR'],
+                app.config['SECRET_KEY'])
+        else:
+            raise ValueError(f'Unknown storage type: {storage_type}')
+
+        app.extensions['storage'] = self
+
+    @property
+    def is_local(self):
+        return isinstance(self.backend, LocalStorage)
+
+    def url(self, key):
+        return self.backend.url(key)
+
+    def presigned_post(self, key, content_type, max_length, expires_in=600):
+        return self.backend.presigned_post(key, content_type, max_length, expires_in)
+
+    def put(self, key, data, content_type):
+        self.backend.put(key, data, content_type)
+
+    def read_header(self, key, length=512):
+        return self.backend.read_header(key, length)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def delete_many(self, keys):
+        return self.backend.delete_many(keys)
+
+
+storage = Storage()
@@ -1,10 +1,57 @@
-import os
 import imghdr
+import datetime
+from collections import Counter
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 
-import boto3
+from flask import make_response, current_app, has_app_context
+from sqlalchemy import insert, update, delete
 
-from app import db, scheduled_delete
-from app.models import Image
+from app import db
+from app.models import Article, Image, Paragraph, StorageDeletion
+from app.publish.storage import storage, image_key
+
+
+# Delete stored images off the request thread, one batch at a time
+storage_deletions = ThreadPoolExecutor(max_workers=1, 
+    thread_name_prefix='storage-deletion')
+
+
+def article_validators(publishing_note):
+    """Return the ETag and Last-Modified date of a published article's page
+
+    The ETag changes whenever the published content changes, as the content 
+    version is bumped and the published article ID changes upon republication.
+
+    Publishing notes record dates but not times. Last-Modified is therefore 
+    withheld on the day of a change, so that a later change on the same day 
+    cannot be hidden from clients that revalidate by date.
+    """
+
+    etag = f'{publishing_note.id}-{publishing_note.published_article_id}-{publishing_note.version}'
+
+    last_changed = publishing_note.date_updated or publishing_note.date_published
+    last_modified = None
+    if last_changed and last_changed < datetime.date.today():
+        last_modified = datetime.datetime.combine(last_changed, datetime.time(),
+            tzinfo=datetime.timezone.utc)
+
+    return etag, last_modified
+
+
+def conditional_response(page, etag, last_modified, status=200):
+    """Return the article page with validators for conditional requests
+    
+    Require shared caches and browsers to revalidate, and vary by cookie so 
+    that anonymous pages are not served to logged in users.
+    """
+    response = make_response(page, status)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
 
 
 # Image validation
@@ -18,37 +65,165 @@ def validate_image(stream):
     return '.' + (format)
 
 
-def delete_unused_image(image, job_id):
-    """Delete uploaded but unused images from database and cloud storage
-    
-    4 hours after upload (controlled by APScheduler), check whether an uploaded
-    image has been marked as 'used' in the database. If unused, delete the 
-    Image model object from the database and delete the related image file from 
-    Amazon S3 cloud storage.
+def article_image_ids(article_id):
+    """Return the IDs of the images of an article and its paragraphs"""
+
+    query = db.session.query(Article.image_id) \
+        .filter(Article.id == article_id, Article.image_id.isnot(None)) \
+        .union(db.session.query(Paragraph.image_id) \
+            .filter(Paragraph.article_id == article_id, Paragraph.image_id.isnot(None)))
+    return [image_id for image_id, in query]
+
+
+def delete_images(image_ids):
+    """Delete Image objects and record their stored images for deletion
+
+    Delete the rows with one DELETE ... RETURNING and record the deletions 
+    with one INSERT, in the current transaction. Return the IDs of the 
+    deletions recorded, to pass to delete_stored_images_later upon commit.
+    """
+
+    if not image_ids:
+        return []
+
+    images = Image.__table__
+    srcs = db.session.execute(delete(images)
+        .where(images.c.id.in_(image_ids))
+        .returning(images.c.src)).scalars().all()
+    keys = list(dict.fromkeys(image_key(src) for src in srcs if src))
+    if not keys:
+        return []
+
+    return db.session.execute(insert(StorageDeletion)
+        .values([{'key': key} for key in keys])
+        .returning(StorageDeletion.id)).scalars().all()
+
+
+def delete_stored_images_later(deletion_ids):
+    """Delete recorded images from storage once the request has committed
+
+    Deletion runs on a background thread, so that the request does not wait
+    on storage, unless STORAGE_DELETE_SYNC is set. Return the future of the
+    background deletion, if any.
+    """
+
+    if not deletion_ids:
+        return None
+    app = current_app._get_current_object()
+    if app.config['STORAGE_DELETE_SYNC']:
+        delete_stored_images(app, deletion_ids)
+        return None
+    return storage_deletions.submit(delete_stored_images, app, deletion_ids)
+
+
+def delete_stored_images(app, deletion_ids=None):
+    """Delete recorded images from storage in batches and remove their records
+
+    Without deletion IDs, retry every recorded deletion. Deletions that fail 
+    are kept, with their attempts incremented and error recorded, for retry,
+    until they reach STORAGE_DELETE_MAX_ATTEMPTS. They are then logged and no 
+    longer retried, and are left for admin to inspect. Return a count of the 
+    images deleted, failed, and given up.
+
+    Push an app context only when run outside one, on a background thread, so
+    that the caller's session is never removed.
+    """
+
+    max_attempts = app.config['STORAGE_DELETE_MAX_ATTEMPTS']
+
+    with nullcontext() if has_app_context() else app.app_context():
+
+        # Get recorded deletions
+        query = db.session.query(StorageDeletion.id, StorageDeletion.key)
+        if deletion_ids is not None:
+            query = query.filter(StorageDeletion.id.in_(deletion_ids))
+        else:
+            query = query.filter(StorageDeletion.attempts < max_attempts)
+        deletions = query.order_by(StorageDeletion.id).all()
+        if not deletions:
+            return Counter()
+
+        # Delete stored images
+        error = 'Storage did not delete the image'
+        try:
+            failed = set(storage.delete_many([key for _, key in deletions]))
+        except Exception as exception:
+            app.logger.exception('Stored images could not be deleted')
+            failed = {key for _, key in deletions}
+            error = str(exception)
+
+        # Remove deleted records and record failures
+        deleted = [id for id, key in deletions if key not in failed]
+        retried = [id for id, key in deletions if key in failed]
+        if deleted:
+            db.session.execute(delete(StorageDeletion)
+                .where(StorageDeletion.id.in_(deleted)))
+        dead = []
+        if retried:
+            dead = db.session.execute(update(StorageDeletion)
+                .where(StorageDeletion.id.in_(retried))
+                .values(
+                    attempts = StorageDeletion.attempts + 1,
+                    last_error = error)
+                .returning(StorageDeletion.key, StorageDeletion.attempts)).all()
+            dead = [key for key, attempts in dead if attempts >= max_attempts]
+        db.session.commit()
+        for key in dead:
+            app.logger.error('Stored image %s not deleted after %d attempts: %s',
+                key, max_attempts, error)
+
+        return Counter(deleted=len(deleted), failed=len(retried), dead=len(dead))
+
+
+def sweep_unused_images(max_age, batch_size):
+    """Delete images left unused for max_age hours after upload
+
+    Select unused images by their partial index, a batch at a time, and delete
+    their rows and stored images in bulk. Rows are locked with SKIP LOCKED, so
+    that concurrent sweeps delete different batches. Then retry any failed 
+    storage deletions. Return a count of the images deleted and failed.
+    """
+
+    app = current_app._get_current_object()
+    changes = Counter()
+    uploaded_before = db.func.now() - datetime.timedelta(hours=max_age)
+
+    while True:
+
+        # Get batch of unused images
+        image_ids = db.session.query(Image.id) \
+            .filter(Image.used == False, Image.date_uploaded < uploaded_before) \
+            .order_by(Image.date_uploaded) \
+            .limit(batch_size) \
+            .with_for_update(skip_locked=True).all()
+        if not image_ids:
+            break
+
+        # Delete images from database, then storage
+        deletion_ids = delete_images([image_id for image_id, in image_ids])
+        db.session.commit()
+        changes['images'] += len(image_ids)
+        changes.update(delete_stored_images(app, deletion_ids))
+
+    # Retry failed storage deletions
+    db.session.commit()
+    changes.update(delete_stored_images(app))
+    return changes
+
+
+def run_unused_image_sweep():
+    """Sweep unused images, as scheduled by the scheduler process
 
-    For convenience, the scheduling job ID is set to the same ID as the database
-    image object ID. 
+    A single recurring job, rather than one per upload, keeps the job store at
+    a constant size.
     """
 
-    print("running")
     # Import app in order to access app context outside view function
     from easy_read import app
 
     with app.app_context():
-        print("deleting")
-        # Get image object from database
-        db_image = db.session.query(Image).filter_by(id = job_id).first()
-        if db_image:
-            # If image is not used
-            if db_image.used == False:
-                # Delete image object from database
-                db.session.delete(db_image)
-                db.session.commit()
-                # Delete image from cloud storage
-                boto3.resource('s3').Object(
-                    os.environ['FLASKS3_BUCKET_NAME'], image).delete()
-
-    # Remove job from scheduler
-    scheduled_delete.remove_job(str(job_id))
-  
-    return print(f'Scheduled job {job_id} deleted')
\ No newline at end of file
+        changes = sweep_unused_images(
+            app.config['UNUSED_IMAGE_MAX_AGE'],
+            app.config['UNUSED_IMAGE_BATCH_SIZE'])
+        app.logger.info('Unused image sweep: %d images, %d stored images deleted, %d failed',
+            changes['images'], changes['deleted'], changes['failed'])
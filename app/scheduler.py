@@ -0,0 +1,142 @@
+"""Run scheduled jobs in a single, dedicated scheduler process
+
+Starting APScheduler inside create_app ran a scheduler thread in every web
+worker and CLI invocation, each polling the same job table, so that one job
+could run on several processes at once. Instead, web workers only record the
+work to be done (eg. images uploaded, requests made), and jobs are run by the
+scheduler process, run by `flask main scheduler` (see Procfile).
+
+Any number of scheduler processes may run, on any number of nodes, but only
+the leader runs jobs. The leader holds a Postgres session-level advisory lock,
+SCHEDULER_LOCK_KEY, on a connection kept open while it leads. Should the
+leader's process or connection die, Postgres releases the lock, and a standby
+takes the lead upon its next attempt, every SCHEDULER_ELECTION_INTERVAL
+seconds.
+
+The lock belongs to the Postgres session, not the pooled connection checkout,
+so closing the connection would return it to the pool still locked. Leaders
+release the lock before closing, or discard the connection if they cannot.
+"""
+
+import time
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app import db
+
+
+# Advisory lock key held by the leading scheduler
+SCHEDULER_LOCK_KEY = 4096001
+
+
+def create_scheduler(app):
+    """Return a scheduler with all scheduled jobs added, persisted in database"""
+
+    scheduler = BackgroundScheduler(
+        jobstores = {'default': SQLAlchemyJobStore(url=app.config['SQLALCHEMY_DATABASE_URI'])},
+        job_defaults = {'coalesce': True, 'max_instances': 1},
+        timezone = 'UTC')
+
+    # Sweep unused images
+    scheduler.add_job('app.publish.utils:run_unused_image_sweep',
+        'interval', minutes=app.config['UNUSED_IMAGE_SWEEP_INTERVAL'],
+        id='sweep-unused-images', replace_existing=True)
+
+    # Email request digests
+    scheduler.add_job('app.publish.digests:run_request_digest',
+        'cron', minute=0, args=['hourly'],
+        id='request-digest-hourly', replace_existing=True)
+    scheduler.add_job('app.publish.digests:run_request_digest',
+        'cron', hour=app.config['REQUEST_DIGEST_HOUR'], minute=0, args=['daily'],
+        id='request-digest-daily', replace_existing=True)
+
+    # Purge sent mail
+    scheduler.add_job('app.outbox:run_outbox_purge',
+        'cron', hour=3, minute=30,
+        id='purge-outbox', replace_existing=True)
+
+    return scheduler
+
+
+def try_lead(connection):
+    """Return whether the connection holds the scheduler's advisory lock
+
+    The lock is held until released or the connection closes. Taking the lock
+    again on the same connection succeeds.
+    """
+    return connection.execute(text('SELECT pg_try_advisory_lock(:key)'),
+        {'key': SCHEDULER_LOCK_KEY}).scalar()
+
+
+def release_lead(connection):
+    """Release the scheduler's advisory lock, or discard the connection if unable
+
+    The lock is taken once per attempt to lead, so release every hold on it.
+    """
+    try:
+        connection.execute(text('SELECT pg_advisory_unlock_all()'))
+    except DBAPIError:
+        connection.invalidate()
+
+
+def is_alive(connection):
+    """Return whether the connection, and so any lock it holds, is alive"""
+    try:
+        connection.execute(text('SELECT 1'))
+        return True
+    except DBAPIError:
+        return False
+
+
+def run_scheduler(interval=None):
+    """Run scheduled jobs while leading, and stand by otherwise, until stopped
+
+    Attempt to lead every SCHEDULER_ELECTION_INTERVAL seconds. Upon leading,
+    run the scheduler until the lock's connection is lost, then wait for any
+    running jobs to finish before standing by.
+    """
+
+    app = current_app._get_current_object()
+    interval = interval or app.config['SCHEDULER_ELECTION_INTERVAL']
+
+    while True:
+
+        # Hold lock on its own connection, outside any transaction, so that
+        # leading never keeps a transaction open
+        try:
+            connection = db.engine.connect() \
+                .execution_options(isolation_level='AUTOCOMMIT')
+        except DBAPIError:
+            app.logger.exception('Scheduler could not connect to database')
+            time.sleep(interval)
+            continue
+
+        leading = False
+        try:
+            # Stand by while another scheduler leads
+            leading = try_lead(connection)
+            if not leading:
+                time.sleep(interval)
+                continue
+
+            # Run jobs while leading
+            app.logger.info('Scheduler leading')
+            scheduler = create_scheduler(app)
+            scheduler.start()
+            try:
+                while is_alive(connection):
+                    time.sleep(interval)
+                app.logger.warning('Scheduler lost lead')
+            finally:
+                scheduler.shutdown()
+        except DBAPIError:
+            app.logger.exception('Scheduler election failed')
+            time.sleep(interval)
+        finally:
+            if leading:
+                release_lead(connection)
+            connection.close()
@@ -3,6 +3,60 @@
 // If the author were to be allowed to delete content out of sequence,
 // content indices would no longer be contiguous.
 
+// || Image Upload
+
+// Error raised by a failed image upload, with the HTTP status of the failure
+class ImageUploadError extends Error {
+    constructor(status) {
+        super(`Image upload failed (${status})`);
+        this.status = status;
+    }
+}
+
+
+// Upload image directly to cloud storage and return its image ID and name
+// The server signs the upload, then validates the stored image once confirmed
+async function uploadImage(file, form) {
+    const headers = {
+        "Content-Type": "application/json",
+        "X-CSRFToken": form.querySelector("[name=csrf_token]").value
+    };
+
+    // Get presigned POST 
+    const signed = await fetch("/sign-image-upload", {
+        method: "POST",
+        headers: headers,
+        body: JSON.stringify({filename: file.name, size: file.size})
+    });
+    if (!signed.ok) {
+        throw new ImageUploadError(signed.status);
+    }
+    const upload = await signed.json();
+
+    // Post file to cloud storage, after the signed fields
+    const data = new FormData();
+    for (const [name, value] of Object.entries(upload.fields)) {
+        data.append(name, value);
+    }
+    data.append("file", file);
+    const stored = await fetch(upload.url, {method: "POST", body: data});
+    if (!stored.ok) {
+        throw new ImageUploadError(stored.status);
+    }
+
+    // Confirm upload
+    const confirmed = await fetch("/confirm-image-upload", {
+        method: "POST",
+        headers: headers,
+        body: JSON.stringify({image_name: upload.image_name})
+    });
+    if (!confirmed.ok) {
+        throw new ImageUploadError(confirmed.status);
+    }
+    return confirmed.json();
+}
+
+
 // <article-image> 
 class ArticleImage extends HTMLElement {
     constructor() {
@@ -122,58 +176,43 @@ class ArticleImage extends HTMLElement {
         
             if (file) {
 
-                // Reappend file input to light DOM before creation of form data
-                this.appendChild(imageInput);
-        
                 // Create image URL
                 img.src = URL.createObjectURL(file);
-                
-                // Create form data object 
-                let formData = new FormData(form);
-
-                // Post form data to server
-                return fetch("/add-image", {
-                    method: "POST",
-                    body: formData
-                })
-                .then(response => {
-
-                    // Successful upload
-                    if (response.ok) { 
-                        response.json().then(response => {
-
-                            // Save image ID to hidden input
-                            hiddenId.value = response.image_id;
-                            imageInput.value = "";
-
-                            // Append elements to light DOM                                   
-                            this.appendChild(img);
-                            this.appendChild(hiddenId);
-                            this.appendChild(altInputDiv);
-                                altInputDiv.appendChild(altInput);
-                            this.appendChild(citeInputDiv);
-                                citeInputDiv.appendChild(citeInput);
-
-                            // Display alert if image has no alt or citation
-                            this.alert_image_support();
-                        })
-                    }
-                    // Failed upload
-                    else {
 
-                        // Alert author
-                        if (response.status === 413) {
-                            alert("The file selected is too large. Images must be under 1MB.");
-                        } else {
-                            alert('The file selected is invalid or not permitted.');
-                        }
-                        
-                        // Reappend file input to shadow DOM
-                        imageLabel.appendChild(imageInput);
-                        imageInput.value = "";
+                try {
+
+                    // Upload image to cloud storage
+                    const response = await uploadImage(file, form);
+
+                    // Save image ID to hidden input
+                    hiddenId.value = response.image_id;
+                    imageInput.value = "";
+
+                    // Append elements to light DOM                                   
+                    this.appendChild(img);
+                    this.appendChild(hiddenId);
+                    this.appendChild(altInputDiv);
+                        altInputDiv.appendChild(altInput);
+                    this.appendChild(citeInputDiv);
+                        citeInputDiv.appendChild(citeInput);
+
+                    // Display alert if image has no alt or citation
+                    this.alert_image_support();
+                }
+                // Failed upload
+                catch (error) {
+                    console.error(error);
+
+                    // Alert author
+                    if (error.status === 413) {
+                        alert("The file selected is too large. Images must be under 5MB.");
+                    } else {
+                        alert('The file selected is invalid or not permitted.');
                     }
-                })
-                .catch(error => console.error(error));
+                    
+                    // Reset file input
+                    imageInput.value = "";
+                }
             }
         });
 
@@ -887,32 +926,13 @@ class ParagraphImage extends HTMLElement {
 
             if (file) {
 
-                // Reappend file input to light DOM before creation of form data
-                fieldList.appendChild(imageInput);
-
                 // Create image URL
                 img.src = URL.createObjectURL(file);
-                
-                // Create form data object 
-                let formData = new FormData(form);
-
-                // Post form data to server
-                return fetch("/add-image", {
-                    method: "POST",
-                    body: formData
-                })
-                .then(response => response.json()) 
-                .catch(error => {
-                    console.error(error);
 
-                    // Alert author
-                    alert('The file selected is invalid or not permitted.');
-                    
-                    // Reappend file input to shadow DOM
-                    imageLabel.appendChild(imageInput);
-                    imageInput.value = ""; 
+                try {
 
-                }).then(response => {
+                    // Upload image to cloud storage
+                    const response = await uploadImage(file, form);
 
                     // Save image ID to hidden input
                     hiddenId.value = response.image_id;
@@ -928,7 +948,21 @@ class ParagraphImage extends HTMLElement {
                     
                     // Display alert if image has no alt or citation
                     this.alert_image_support();
-                });
+                }
+                // Failed upload
+                catch (error) {
+                    console.error(error);
+
+                    // Alert author
+                    if (error.status === 413) {
+                        alert("The file selected is too large. Images must be under 5MB.");
+                    } else {
+                        alert('The file selected is invalid or not permitted.');
+                    }
+
+                    // Reset file input
+                    imageInput.value = ""; 
+                }
             }
         });
     
@@ -117,3 +117,261 @@ submitButton.addEventListener("click", (event) => {
     }
 })
 
+
+// || JSON Submission
+
+// Submit the article as compact JSON rather than WTForms-style fields
+const articleForm = document.getElementById("article-form");
+
+
+// Serialise image fields, or null if no image is attached
+function serialiseImage(id, alt, cite) {
+    if (!id) {
+        return null;
+    }
+    return {id: parseInt(id), alt: alt || "", cite: cite || ""};
+}
+
+
+// Serialise paragraph fields, keyed by paragraph index and summary level
+function serialiseParagraphs(data) {
+    const paragraphs = {};
+
+    // Group fields by paragraph, and summary fields by level, in a single pass
+    for (const [name, value] of data.entries()) {
+        const match = name.match(/^paragraph-(\d+)-(?:summary-(\d+)-)?(\w+)$/);
+        if (match) {
+            const paragraph = paragraphs[match[1]] = paragraphs[match[1]] || {fields: {}, summaries: {}};
+            if (match[2]) {
+                const summary = paragraph.summaries[match[2]] = paragraph.summaries[match[2]] || {};
+                summary[match[3]] = value;
+            } 
+            else {
+                paragraph.fields[match[3]] = value;
+            }
+        }
+    }
+
+    const serialised = {};
+    for (const paragraph of Object.values(paragraphs)) {
+        const summaries = {};
+        for (const summary of Object.values(paragraph.summaries)) {
+            summaries[summary.level] = summary.text || "";
+        }
+        serialised[paragraph.fields.paragraph_index] = {
+            header: paragraph.fields.paragraph_header || "",
+            image: serialiseImage(paragraph.fields.paragraph_image_id,
+                paragraph.fields.paragraph_image_alt, paragraph.fields.paragraph_image_cite),
+            summaries: summaries
+        };
+    }
+    return serialised;
+}
+
+
+// Serialise form fields to the article JSON schema
+function serialiseArticle(form) {
+    const data = new FormData(form);
+    const paragraphs = serialiseParagraphs(data);
+
+    // Order paragraphs by index and summaries by level
+    const byKey = (a, b) => a[0] - b[0];
+    return {
+        title: data.get("article_title"),
+        description: data.get("article_desc"),
+        image: serialiseImage(data.get("article_image_id"), 
+            data.get("article_image_alt"), data.get("article_image_cite")),
+        source: {
+            title: data.get("source_title"),
+            author: data.get("source_author"),
+            link: data.get("source_link"),
+            name: data.get("source_name"),
+            contact: data.get("source_contact")
+        },
+        categories: [...data.entries()]
+            .filter(([name]) => name.startsWith("article_category-"))
+            .map(([name, value]) => value),
+        paragraphs: Object.entries(paragraphs).sort(byKey).map(([index, paragraph]) => ({
+            header: paragraph.header,
+            image: paragraph.image,
+            summaries: Object.entries(paragraph.summaries).sort(byKey).map(([level, text]) => text)
+        }))
+    };
+}
+
+
+// Gzip request body where supported by the browser
+async function compressBody(body) {
+    if (!("CompressionStream" in window)) {
+        return {body: body, headers: {}};
+    }
+    const stream = new Blob([body]).stream().pipeThrough(new CompressionStream("gzip"));
+    return {body: await new Response(stream).blob(), headers: {"Content-Encoding": "gzip"}};
+}
+
+
+// Post article as JSON, falling back to form submission if unavailable
+articleForm.addEventListener("submit", async (event) => {
+    const url = articleForm.dataset.jsonAction;
+    if (!url || !window.fetch) {
+        return;
+    }
+    event.preventDefault();
+
+    // Cancel pending autosave, as the whole article is saved
+    clearTimeout(autosaveTimer);
+
+    const {body, headers} = await compressBody(JSON.stringify(serialiseArticle(articleForm)));
+    headers["Content-Type"] = "application/json";
+    headers["X-CSRFToken"] = articleForm.querySelector("[name=csrf_token]").value;
+    if (articleForm.dataset.revision) {
+        headers["If-Match"] = `"${articleForm.dataset.revision}"`;
+    }
+
+    try {
+        const response = await fetch(url, {method: "POST", headers: headers, body: body});
+
+        // Follow access redirects
+        if (response.redirected) {
+            window.location = response.url;
+            return;
+        }
+
+        const result = await response.json().catch(() => ({}));
+        if (response.ok) {
+            window.location = result.redirect;
+        } 
+        else if (response.status === 413) {
+            alert("The article is too long to save.");
+        } 
+        else {
+            alert(result.error || "The article could not be saved. Please try again.");
+        }
+    }
+    catch (error) {
+        console.error(error);
+        alert("The article could not be saved. Please check your connection and try again.");
+    }
+});
+
+
+// || Autosave
+
+// Autosave changed paragraphs once the author pauses writing (edit mode only)
+const autosaveUrl = articleForm.dataset.autosaveAction;
+const autosaveDelay = 3000;
+let autosaveRevision = parseInt(articleForm.dataset.revision);
+let autosavedParagraphs = serialiseParagraphs(new FormData(articleForm));
+let autosaveTimer = null;
+let autosaving = false;
+let autosaveStopped = false;
+
+
+// Compare paragraphs to those last saved, returning only what has changed
+function paragraphChanges(saved, current) {
+    const changes = {};
+    for (const index of new Set([...Object.keys(saved), ...Object.keys(current)])) {
+        const before = saved[index];
+        const after = current[index];
+
+        // Delete removed paragraphs
+        if (!after) {
+            changes[index] = null;
+            continue;
+        }
+
+        // Include changed header and image
+        const change = {};
+        if (!before || before.header !== after.header) {
+            change.header = after.header;
+        }
+        if (!before || JSON.stringify(before.image) !== JSON.stringify(after.image)) {
+            change.image = after.image;
+        }
+
+        // Include changed summaries, and null for removed summaries
+        const summaries = {};
+        const savedSummaries = before ? before.summaries : {};
+        for (const level of new Set([...Object.keys(savedSummaries), ...Object.keys(after.summaries)])) {
+            if (!(level in after.summaries)) {
+                summaries[level] = null;
+            }
+            else if (savedSummaries[level] !== after.summaries[level]) {
+                summaries[level] = after.summaries[level];
+            }
+        }
+        if (Object.keys(summaries).length) {
+            change.summaries = summaries;
+        }
+
+        if (Object.keys(change).length) {
+            changes[index] = change;
+        }
+    }
+    return changes;
+}
+
+
+// Send changes made since the last autosave
+async function autosave() {
+
+    // Wait for the previous autosave to complete
+    if (autosaving) {
+        scheduleAutosave();
+        return;
+    }
+
+    const current = serialiseParagraphs(new FormData(articleForm));
+    const changes = paragraphChanges(autosavedParagraphs, current);
+    if (!Object.keys(changes).length) {
+        return;
+    }
+
+    autosaving = true;
+    try {
+        const response = await fetch(autosaveUrl, {
+            method: "PATCH",
+            headers: {
+                "Content-Type": "application/json",
+                "X-CSRFToken": articleForm.querySelector("[name=csrf_token]").value
+            },
+            body: JSON.stringify({revision: autosaveRevision, paragraphs: changes})
+        });
+        const result = await response.json().catch(() => ({}));
+
+        if (response.ok) {
+            autosaveRevision = result.revision;
+            articleForm.dataset.revision = result.revision;
+            articleForm.querySelector("[name=revision]").value = result.revision;
+            autosavedParagraphs = current;
+        }
+        else if (response.status === 409) {
+
+            // Stop autosaving to avoid overwriting other changes
+            autosaveStopped = true;
+            alert(result.error || "This article has been saved elsewhere. Please refresh the page to continue editing.");
+        }
+    }
+    catch (error) {
+        console.error(error);
+    }
+    finally {
+        autosaving = false;
+    }
+}
+
+
+// Debounce autosave until the author pauses
+function scheduleAutosave() {
+    if (autosaveStopped) {
+        return;
+    }
+    clearTimeout(autosaveTimer);
+    autosaveTimer = setTimeout(autosave, autosaveDelay);
+}
+
+
+if (autosaveUrl && window.fetch) {
+    articleForm.addEventListener("input", scheduleAutosave);
+    articleForm.addEventListener("change", scheduleAutosave);
+}
@@ -19,6 +19,7 @@
 //      - hyperlink article
 // || Article Status Icons
 // || Articles filter
+// || Infinite Scroll
 
 
 // || No Results Icon
@@ -593,53 +594,128 @@ for (let article of articlesDisplayed) {
 
 // || Articles Filter
 
-// Filter articles by category
-const selectCategory = document.getElementById("select-category");
-if (selectCategory) {
-    selectCategory.addEventListener("change", (option) => {
-        let allArticles = display.querySelectorAll("li");
-        for (let article of allArticles) {
-            // Hide all articles
-            article.classList.replace("result-display", "result-display-none");
-            // Display articles with selected category
-            if (article.dataset.category.includes(option.target.value)) {
-                article.classList.replace("result-display-none", "result-display");
-            }
+// Get filters (category and date) from URL or filter form
+const filterForm = document.getElementById("articles-filter");
+function getFilters() {
+    let filters = new URLSearchParams();
+    let source = filterForm ? new FormData(filterForm) : new URL(window.location.href).searchParams;
+    for (let name of ["category", "date"]) {
+        let value = source.get(name);
+        if (value) {
+            filters.set(name, value);
         }
-        // Reset value of time filter
-        selectDate.querySelector("select").value = "";
-    });
+    }
+    return filters;
 }
 
-// Filter articles by date published
-const selectDate = document.getElementById("select-date");
-if (selectDate) {
-    selectDate.addEventListener("change", (option) => {
-        let allArticles = display.querySelectorAll("li");
-        for (let article of allArticles) {
-            // Hide all articles
-            article.classList.replace("result-display", "result-display-none");
-            // Display articles with selected time
-            if (article.dataset.time.includes(option.target.value)) {
-                article.classList.replace("result-display-none", "result-display");
-            }
+// Fetch page of filtered articles as JSON
+function fetchArticles(cursor) {
+    let url = new URL(moreArticles.dataset.url, window.location.origin);
+    url.search = getFilters().toString();
+    if (cursor) {
+        url.searchParams.set("after", cursor);
+    }
+    return fetch(url).then((response) => response.json());
+}
+
+// Relabel filter options with article counts
+function updateFacets(facets) {
+    for (let [name, options] of [["category", facets.categories], ["date", facets.dates]]) {
+        let select = filterForm.querySelector("select[name='" + name + "']");
+        let selected = select.value;
+        // Remove all options except 'All'
+        while (select.options.length > 1) {
+            select.remove(1);
+        }
+        for (let option of options) {
+            let element = new Option(option.name + " (" + option.count + ")", option.name);
+            element.selected = option.name == selected;
+            select.add(element);
         }
-        // Reset value of date filter
-        selectCategory.querySelector("select").value = "";
+    }
+}
+
+// Filter articles upon change of category or date
+if (filterForm) {
+    filterForm.addEventListener("change", () => {
+        fetchArticles().then((page) => {
+            // Replace articles
+            let list = display.querySelector("ul");
+            list.replaceChildren(...page.articles.map(createArticleCard));
+            updateFacets(page.facets);
+            updateMoreArticles(page.next_cursor);
+            reportNoResults();
+            // Record filters in URL
+            let filters = getFilters().toString();
+            window.history.replaceState(null, "", filters ? "?" + filters : window.location.pathname);
+        });
     });
 }
 
-// Filter artilces by category from URL parameters
-let url = new URL(window.location.href);
-let category = url.searchParams.get("category");
-if (category) {
-    let allArticles = display.querySelectorAll("li");
-    for (let article of allArticles) {
-        // Hide all articles
-        article.classList.replace("result-display", "result-display-none");
-        // Display articles with selected time
-        if (article.dataset.category.includes(category)) {
-            article.classList.replace("result-display-none", "result-display");
-        }
+
+// || Infinite Scroll
+
+// Create article card from JSON
+function createArticleCard(article) {
+    let card = document.createElement("li");
+    card.setAttribute("class", "label-colour result-display");
+    card.dataset.category = article.categories.join(" ") + " ";
+    card.dataset.time = article.date_published;
+    let link = document.createElement("a");
+    link.setAttribute("href", article.url);
+    if (article.image_src) {
+        let image = document.createElement("img");
+        image.setAttribute("src", article.image_src);
+        image.setAttribute("alt", article.image_alt || "");
+        link.appendChild(image);
+    }
+    let title = document.createElement("h3");
+    title.textContent = article.title;
+    link.appendChild(title);
+    let description = document.createElement("p");
+    description.textContent = article.description;
+    link.appendChild(description);
+    card.appendChild(link);
+    return card;
+}
+
+// Show or hide link to following page
+const moreArticles = document.getElementById("more-articles");
+function updateMoreArticles(cursor) {
+    moreArticles.dataset.nextCursor = cursor || "";
+    if (cursor) {
+        let filters = getFilters();
+        filters.set("after", cursor);
+        moreArticles.setAttribute("href", "?" + filters.toString());
+        moreArticles.classList.remove("no-display");
+    } else {
+        moreArticles.classList.add("no-display");
     }
 }
+
+// Fetch next page of articles when the reader reaches the end of the list
+if (moreArticles && "IntersectionObserver" in window) {
+    let loading = false;
+    let observer = new IntersectionObserver((entries) => {
+        let cursor = moreArticles.dataset.nextCursor;
+        if (!entries[0].isIntersecting || !cursor || loading) {
+            return;
+        }
+        loading = true;
+        fetchArticles(cursor)
+            .then((page) => {
+                // Append articles to list
+                let list = display.querySelector("ul");
+                for (let article of page.articles) {
+                    list.appendChild(createArticleCard(article));
+                }
+                updateMoreArticles(page.next_cursor);
+                loading = false;
+                // Re-observe to fetch again if the link is still in view
+                observer.unobserve(moreArticles);
+                observer.observe(moreArticles);
+            })
+            .catch(() => { loading = false; });
+    });
+    observer.observe(moreArticles);
+}
@@ -28,11 +28,45 @@ class Config(object):
     # Configure images
     MAX_CONTENT_LENGTH = 1024 * 1024    # 1MB
     UPLOAD_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif']
+    MAX_IMAGE_LENGTH = int(os.environ.get('MAX_IMAGE_LENGTH') or 5 * 1024 * 1024)    # 5MB, uploaded to S3 directly
+
+    # Configure deletion of unused images
+    UNUSED_IMAGE_MAX_AGE = int(os.environ.get('UNUSED_IMAGE_MAX_AGE') or 4)    # hours after upload
+    UNUSED_IMAGE_SWEEP_INTERVAL = int(os.environ.get('UNUSED_IMAGE_SWEEP_INTERVAL') or 30)    # minutes
+    UNUSED_IMAGE_BATCH_SIZE = int(os.environ.get('UNUSED_IMAGE_BATCH_SIZE') or 500)
+
+    # Configure JSON article submission (decompressed size)
+    MAX_ARTICLE_JSON_LENGTH = int(os.environ.get('MAX_ARTICLE_JSON_LENGTH') or 8 * 1024 * 1024)    # 8MB
 
     # Configure Amazon S3 storage
     FLASKS3_BUCKET_NAME = os.environ.get('FLASKS3_BUCKET_NAME')
     FLASKS3_FORCE_MIMETYPE = True
 
+    # Configure image storage ('s3' or 'local')
+    STORAGE_TYPE = os.environ.get('STORAGE_TYPE') or 's3'
+    STORAGE_REGION = os.environ.get('STORAGE_REGION') or 'eu-west-2'
+    STORAGE_URL = os.environ.get('STORAGE_URL')    # Defaults to the bucket's URL
+    STORAGE_MAX_CONNECTIONS = int(os.environ.get('STORAGE_MAX_CONNECTIONS') or 10)
+    STORAGE_DIR = os.environ.get('STORAGE_DIR') or os.path.join(basedir, 'uploads')
+    STORAGE_DELETE_SYNC = os.environ.get('STORAGE_DELETE_SYNC') == 'true'    # Delete images on the request thread
+    STORAGE_DELETE_MAX_ATTEMPTS = int(os.environ.get('STORAGE_DELETE_MAX_ATTEMPTS') or 8)
+
+    # Configure article listings
+    ARTICLES_PER_PAGE = int(os.environ.get('ARTICLES_PER_PAGE') or 24)
+
+    # Configure rendered article cache ('lru', 'filesystem', or 'null')
+    ARTICLE_CACHE_TYPE = os.environ.get('ARTICLE_CACHE_TYPE') or 'lru'
+    ARTICLE_CACHE_DIR = os.environ.get('ARTICLE_CACHE_DIR') or \
+        os.path.join(basedir, '.article_cache')
+    ARTICLE_CACHE_THRESHOLD = int(os.environ.get('ARTICLE_CACHE_THRESHOLD') or 500)
+    ARTICLE_CACHE_TIMEOUT = int(os.environ.get('ARTICLE_CACHE_TIMEOUT') or 0)    # 0 = no expiry
+
+    # Configure logged in user cache, held per process. Role and password changes
+    # only reach other processes once their entries time out, so the timeout is
+    # the window for revoking access
+    USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT') or 0)    # seconds, 0 = disabled
+    USER_CACHE_THRESHOLD = int(os.environ.get('USER_CACHE_THRESHOLD') or 1000)
+
     # Configure mail settings 
     MAIL_SERVER = os.environ.get('MAIL_SERVER')    # $env  smtp.googlemail.com
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)    # $env 587
@@ -40,5 +74,21 @@ class Config(object):
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')    # $env andrew@an-easy-read.com
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')    # $env <app password>
     ADMIN = ['andrew@an-easy-read.com', 'adkwalters@gmail.com']
+    SITE_URL = os.environ.get('SITE_URL') or 'https://an-easy-read.com'    # For links in scheduled emails
+
+    # Configure publication request emails ('immediate', 'hourly', or 'daily')
+    ADMIN_REQUEST_DIGEST = os.environ.get('ADMIN_REQUEST_DIGEST') or 'immediate'
+    REQUEST_DIGEST_HOUR = int(os.environ.get('REQUEST_DIGEST_HOUR') or 8)    # Hour of daily digest, UTC
+
+    # Configure mail worker (see app/outbox.py)
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE') or 50)
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS') or 8)
+    MAIL_RETRY_DELAY = int(os.environ.get('MAIL_RETRY_DELAY') or 60)    # seconds, doubling upon each attempt
+    MAIL_WORKER_INTERVAL = int(os.environ.get('MAIL_WORKER_INTERVAL') or 5)    # seconds between polls when idle
+    MAIL_LEASE = int(os.environ.get('MAIL_LEASE') or 300)    # seconds a worker holds a batch while sending
+    MAIL_RETENTION_DAYS = int(os.environ.get('MAIL_RETENTION_DAYS') or 30)    # days sent messages are kept
+
+    # Configure scheduler (see app/scheduler.py)
+    SCHEDULER_ELECTION_INTERVAL = int(os.environ.get('SCHEDULER_ELECTION_INTERVAL') or 15)    # seconds between attempts to lead
     
     
\ No newline at end of file
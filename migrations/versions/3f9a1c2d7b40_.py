@@ -0,0 +1,25 @@
+"""add publishing note content version
+
+Revision ID: 3f9a1c2d7b40
+Revises: 154cfb5a068e
+Create Date: 2026-10-18 09:12:04.218531
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2d7b40'
+down_revision = '154cfb5a068e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('publishing_note', sa.Column('version', sa.Integer(),
+        server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('publishing_note', 'version')
@@ -0,0 +1,30 @@
+"""add storage deletion
+
+Revision ID: 5c3d9e7a1f20
+Revises: e2f8a4c61d37
+Create Date: 2026-10-18 17:04:12.551930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c3d9e7a1f20'
+down_revision = 'e2f8a4c61d37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('storage_deletion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('date_queued', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+
+
+def downgrade():
+    op.drop_table('storage_deletion')
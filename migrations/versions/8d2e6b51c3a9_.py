@@ -0,0 +1,26 @@
+"""add publishing note snapshot
+
+Revision ID: 8d2e6b51c3a9
+Revises: 3f9a1c2d7b40
+Create Date: 2026-10-18 11:40:27.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e6b51c3a9'
+down_revision = '3f9a1c2d7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('publishing_note', sa.Column('snapshot',
+        postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade():
+    op.drop_column('publishing_note', 'snapshot')
@@ -0,0 +1,32 @@
+"""add image upload date
+
+Revision ID: 9a41f6c2e8b3
+Revises: 5c3d9e7a1f20
+Create Date: 2026-10-18 18:12:40.318264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a41f6c2e8b3'
+down_revision = '5c3d9e7a1f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('image', sa.Column('date_uploaded', sa.DateTime(),
+        server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_image_unused', 'image', ['date_uploaded'],
+        postgresql_where=sa.text('used = false'))
+
+    # Remove per-image deletion jobs, replaced by a single sweep
+    if sa.inspect(op.get_bind()).has_table('apscheduler_jobs'):
+        op.execute("DELETE FROM apscheduler_jobs WHERE id ~ '^[0-9]+$'")
+
+
+def downgrade():
+    op.drop_index('ix_image_unused', table_name='image')
+    op.drop_column('image', 'date_uploaded')
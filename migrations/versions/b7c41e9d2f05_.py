@@ -0,0 +1,71 @@
+"""add indexes for status, assignment, and listing queries
+
+Revision ID: b7c41e9d2f05
+Revises: 8d2e6b51c3a9
+Create Date: 2026-10-18 14:02:11.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c41e9d2f05'
+down_revision = '8d2e6b51c3a9'
+branch_labels = None
+depends_on = None
+
+
+# Index name, table, columns, and keyword arguments
+INDEXES = [
+    ('ix_article_status', 'article', ['status'], {}),
+    ('ix_article_author_id_status', 'article', ['author_id', 'status'], {}),
+    ('ix_article_publisher_id_status', 'article', ['publisher_id', 'status'], {}),
+    ('ix_article_category_article_id', 'article_category', ['article_id'], {}),
+    ('ix_article_category_category_id', 'article_category', ['category_id'], {}),
+    ('ix_publishing_note_draft_article_id', 'publishing_note', ['draft_article_id'], {}),
+    ('ix_publishing_note_published_article_id', 'publishing_note', ['published_article_id'], {}),
+    ('ix_publishing_note_live', 'publishing_note',
+        [sa.text('date_published DESC'), sa.text('id DESC')],
+        {'postgresql_where': sa.text('is_active')}),
+    ('ix_user_published_by', 'user', ['published_by'], {}),
+    ('ix_publisher_user_id', 'publisher', ['user_id'], {}),
+]
+
+
+def upgrade():
+    # Merge duplicate categories into the lowest ID before enforcing uniqueness
+    op.execute("""
+        UPDATE article_category SET category_id = keep.id
+        FROM category, (SELECT name, min(id) AS id FROM category GROUP BY name) AS keep
+        WHERE article_category.category_id = category.id
+            AND category.name = keep.name
+            AND category.id != keep.id
+    """)
+    op.execute("""
+        DELETE FROM category USING category AS keep
+        WHERE category.name = keep.name AND category.id > keep.id
+    """)
+    op.execute("""
+        DELETE FROM article_category USING article_category AS keep
+        WHERE article_category.article_id = keep.article_id
+            AND article_category.category_id = keep.category_id
+            AND article_category.ctid > keep.ctid
+    """)
+
+    # Build indexes without locking tables against writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_category_name', 'category', ['name'],
+            unique=True, postgresql_concurrently=True)
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns,
+                postgresql_concurrently=True, **kwargs)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in reversed(INDEXES):
+            op.drop_index(name, table_name=table,
+                postgresql_concurrently=True)
+        op.drop_index('ix_category_name', table_name='category',
+            postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""add outbox message
+
+Revision ID: c6e1b8d4a725
+Revises: 9a41f6c2e8b3
+Create Date: 2026-10-18 19:30:05.726118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e1b8d4a725'
+down_revision = '9a41f6c2e8b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbox_message',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(), nullable=True),
+        sa.Column('sender', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('recipients', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('cc', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('bcc', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('reply_to', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('body', sa.Text(), nullable=True),
+        sa.Column('html', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(), server_default='pending', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('date_created', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('next_attempt', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('date_sent', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_outbox_message_pending', 'outbox_message', ['next_attempt'],
+        postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    op.drop_index('ix_outbox_message_pending', table_name='outbox_message')
+    op.drop_table('outbox_message')
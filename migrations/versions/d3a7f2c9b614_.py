@@ -0,0 +1,32 @@
+"""add request digests
+
+Revision ID: d3a7f2c9b614
+Revises: c6e1b8d4a725
+Create Date: 2026-10-18 20:41:57.093514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7f2c9b614'
+down_revision = 'c6e1b8d4a725'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('publisher', sa.Column('request_digest', sa.String(),
+        server_default='immediate', nullable=False))
+    op.add_column('article', sa.Column('request_notified', sa.Boolean(),
+        server_default='false', nullable=False))
+
+    # Outstanding requests were emailed upon request
+    op.execute("UPDATE article SET request_notified = true "
+        "WHERE status IN ('requested', 'pub_requested')")
+
+
+def downgrade():
+    op.drop_column('article', 'request_notified')
+    op.drop_column('publisher', 'request_digest')
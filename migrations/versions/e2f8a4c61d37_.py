@@ -0,0 +1,25 @@
+"""add article revision
+
+Revision ID: e2f8a4c61d37
+Revises: b7c41e9d2f05
+Create Date: 2026-10-18 15:21:48.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f8a4c61d37'
+down_revision = 'b7c41e9d2f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('article', sa.Column('revision', sa.Integer(),
+        server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('article', 'revision')
@@ -0,0 +1,30 @@
+"""add outbox leases
+
+Revision ID: f4b2a8c1d906
+Revises: d3a7f2c9b614
+Create Date: 2026-10-19 10:12:33.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b2a8c1d906'
+down_revision = 'd3a7f2c9b614'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('outbox_message', sa.Column('locked_until', sa.DateTime(), nullable=True))
+    op.create_index('ix_outbox_message_sending', 'outbox_message', ['locked_until'],
+        postgresql_where=sa.text("status = 'sending'"))
+    op.create_index('ix_outbox_message_sent', 'outbox_message', ['date_sent'],
+        postgresql_where=sa.text("status = 'sent'"))
+
+
+def downgrade():
+    op.drop_index('ix_outbox_message_sent', table_name='outbox_message')
+    op.drop_index('ix_outbox_message_sending', table_name='outbox_message')
+    op.drop_column('outbox_message', 'locked_until')